@@ -0,0 +1,145 @@
+"""
+Shared log() for every script.
+
+    from app_logging import get_log
+    log = get_log("verify.log")
+    log("Launching browser...")   # prints and appends "[HH:MM:SS] Launching browser..."
+
+log() prints the line and hands the record to a QueueHandler, so the
+caller never waits on disk. A QueueListener thread writes records to a
+size-rotating file (LOG_MAX_BYTES, LOG_BACKUP_COUNT backups) through a
+buffered stream that is flushed every FLUSH_INTERVAL seconds and at exit.
+SIGTERM (job cancel, /clipper/stop) also writes out the queue and buffers
+before the process dies, unless the script installed its own handler and
+exits normally.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import signal
+import threading
+import time
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+FLUSH_INTERVAL = 1.0
+LOG_FORMAT = logging.Formatter("[%(asctime)s] %(message)s", "%H:%M:%S")
+
+_file_handlers = []
+_listeners = []
+_setup_lock = threading.Lock()
+_flusher = None
+
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that leaves flushing to the periodic flusher.
+
+    The stock handler flushes after every record; here records collect in
+    the file's write buffer until flush_now() runs (every FLUSH_INTERVAL,
+    before a rollover, and on close).
+    """
+
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        self.acquire()
+        try:
+            if self.stream and not self.stream.closed:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def doRollover(self):
+        self.flush_now()
+        super().doRollover()
+
+    def close(self):
+        self.flush_now()
+        super().close()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        with _setup_lock:
+            handlers = list(_file_handlers)
+        for handler in handlers:
+            try:
+                handler.flush_now()
+            except (OSError, ValueError):
+                pass
+
+
+def _drain():
+    """Write every queued record and flush the files; later records are dropped."""
+    with _setup_lock:
+        listeners = list(_listeners)
+        _listeners.clear()
+        handlers = list(_file_handlers)
+    for listener in listeners:
+        listener.stop()
+    for handler in handlers:
+        try:
+            handler.flush_now()
+        except (OSError, ValueError):
+            pass
+
+
+def _on_sigterm(signum, frame):
+    _drain()
+    # Die from the signal as before, so the parent still sees it
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def _install_sigterm_handler():
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+
+def get_log(log_file, echo=True):
+    """Return a log(msg) function writing "[HH:MM:SS] msg" lines to log_file.
+
+    Calls for the same file share one logger, queue and writer thread.
+    echo=False skips printing to stdout.
+    """
+    global _flusher
+    logger = logging.getLogger(f"app.{log_file}")
+    with _setup_lock:
+        if not logger.handlers:
+            file_handler = BufferedRotatingFileHandler(
+                log_file,
+                maxBytes=LOG_MAX_BYTES,
+                backupCount=LOG_BACKUP_COUNT,
+                encoding="utf-8",
+                delay=True,
+            )
+            file_handler.setFormatter(LOG_FORMAT)
+            records = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(records, file_handler)
+            listener.start()
+            if not _listeners and not _file_handlers:
+                # Drain the queues before logging.shutdown() closes the handlers
+                atexit.register(_drain)
+                _install_sigterm_handler()
+            _listeners.append(listener)
+
+            logger.addHandler(logging.handlers.QueueHandler(records))
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _file_handlers.append(file_handler)
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_forever, name="log-flusher", daemon=True)
+                _flusher.start()
+
+    def log(msg):
+        if echo:
+            print(f"[{time.strftime('%H:%M:%S')}] {msg}")
+        logger.info(msg)
+
+    return log
@@ -0,0 +1,360 @@
+"""
+Backstage "Add Host" flow driven by readiness conditions instead of fixed sleeps.
+
+    timer = StepTimer()
+    if await wait_for_backstage(page, timer) == "login":
+        ...
+    await open_invite_dialog(page, timer)
+    await submit_ids(page, ids, timer)
+    await wait_for_rows(page, ids, timer)
+    rows = match_rows(await extract_rows(page), ids)   # {id: {"cells", "text"}}
+    log(timer.report())
+
+or, reading the eligibility XHR instead of the table:
+
+    capture = ResponseCapture(page)
+    await submit_ids(page, ids, timer)
+    statuses = await capture.wait(ids, timer)           # {id: "available" | "bound" | ...}
+
+Each step returns as soon as the UI is ready (a selector is visible, the
+result rows for the submitted ids are in) and raises playwright's
+TimeoutError when it never gets there. StepTimer keeps how long every
+step took so runs can be compared (see replay_backstage.py).
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+ADD_HOST_BUTTON = 'button[data-e2e-tag="host_manageRelationship_addHostBtn"]'
+INVITE_TEXTAREA = 'textarea[data-testid="inviteHostTextArea"]'
+NEXT_BUTTON = "button:has-text('다음'), button:has-text('Next'), .semi-modal-content button.semi-button-primary"
+RESULT_TABLE = ".semi-table-tbody"
+RESULT_ROWS = '.semi-table-tbody tr[role="row"]'
+
+PAGE_TIMEOUT = 30000
+DIALOG_TIMEOUT = 10000
+RESULTS_TIMEOUT = 15000
+LOGIN_TIMEOUT = 300000
+# Result rows count as complete once their number stops changing this long
+ROWS_SETTLE_MS = 500
+# After an eligibility response, how long to wait for more before the table
+RESPONSE_SETTLE_MS = 300
+# Backstage JSON responses that may carry host eligibility (URL substrings)
+ELIGIBILITY_URL_HINTS = tuple(
+    h for h in os.environ.get("BACKSTAGE_ELIGIBILITY_HINTS", "invite,anchor/check,host/check").split(",") if h
+)
+BACKSTAGE_HOST = "live-backstage.tiktok.com"
+# Histogram bucket upper bounds (ms)
+TIMING_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+# True once every submitted id has a row, or the matching rows stopped
+# changing for settleMs (ids Backstage drops never get a row).
+_ROWS_READY_JS = """
+([selector, ids, settleMs]) => {
+    const rows = Array.from(document.querySelectorAll(selector));
+    // Same exact-token rule as match_rows: "user1" is not ready on a "user10" row
+    const tokens = new Set();
+    for (const r of rows) {
+        for (const t of r.innerText.split(/\s+/)) {
+            tokens.add(t.replace(/^@+/, "").toLowerCase());
+        }
+    }
+    const matched = ids.filter(id => tokens.has(id)).length;
+    const now = performance.now();
+    const watch = window.__rowsWatch;
+    if (!watch || watch.matched !== matched) {
+        window.__rowsWatch = {matched, since: now};
+        return matched === ids.length;
+    }
+    return matched === ids.length || (matched > 0 && now - watch.since >= settleMs);
+}
+"""
+
+# status -> (reason stored in verified_creators.json, keywords in Backstage text)
+STATUSES = {
+    "available": ("사용 가능", ("사용 가능", "Available")),
+    "ineligible": ("부적격", ("부적격", "Ineligible")),
+    "bound": ("이미 소속됨", ("바인딩", "Bound", "에이전시", "agency")),
+    "not_qualified": ("자격 없음", ("자격 없음", "Not qualified")),
+    "unknown": ("알 수 없음", ()),
+}
+# Keys that name the handle, and that carry eligibility, in a response item
+HANDLE_KEYS = ("display_id", "displayId", "unique_id", "uniqueId", "handle", "user_name", "userName", "username")
+ELIGIBLE_KEYS = ("can_invite", "canInvite", "eligible", "is_eligible", "isEligible", "invitable", "available")
+BOUND_KEYS = ("is_bound", "isBound", "bound", "has_agency", "hasAgency")
+REASON_KEYS = ("reason", "reason_desc", "reasonDesc", "status_desc", "statusDesc", "status_text", "message", "msg", "status")
+
+# Every result row as {"cells": [td text, ...], "text": row text}, in one round trip
+_EXTRACT_ROWS_JS = """
+(selector) => Array.from(document.querySelectorAll(selector)).map(row => ({
+    cells: Array.from(row.querySelectorAll('td')).map(td => td.innerText.trim()),
+    text: row.innerText,
+}))
+"""
+
+
+class StepTimer:
+    """Wall-clock durations per named step, with a text histogram."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.samples.setdefault(name, []).append(ms)
+
+    def total(self):
+        return sum(sum(values) for values in self.samples.values())
+
+    def report(self):
+        lines = []
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            p50 = ordered[len(ordered) // 2]
+            labels = [f"≤{b}" for b in TIMING_BUCKETS] + [f">{TIMING_BUCKETS[-1]}"]
+            counts = [0] * len(labels)
+            for ms in values:
+                counts[next((i for i, b in enumerate(TIMING_BUCKETS) if ms <= b), len(TIMING_BUCKETS))] += 1
+            buckets = " ".join(f"{label}:{count}" for label, count in zip(labels, counts) if count)
+            lines.append(f"{name:<14} n={len(values):<3} p50={p50:>6.0f}ms max={ordered[-1]:>6.0f}ms  [{buckets}]")
+        return "\n".join(lines)
+
+
+async def wait_for_backstage(page, timer, timeout=PAGE_TIMEOUT):
+    """Wait until the Add Host button is visible or Backstage sent us to login.
+
+    Returns "ready" or "login".
+    """
+    with timer.step("page_ready"):
+        await page.wait_for_function(
+            """(selector) => {
+                if (location.href.toLowerCase().includes('login')) return true;
+                const el = document.querySelector(selector);
+                return !!el && el.getClientRects().length > 0;
+            }""",
+            arg=ADD_HOST_BUTTON,
+            timeout=timeout,
+            polling=100,
+        )
+    return "login" if "login" in page.url.lower() else "ready"
+
+
+async def wait_for_login(page, timer, timeout=LOGIN_TIMEOUT):
+    """Wait for a manual login to leave the login page."""
+    with timer.step("login"):
+        await page.wait_for_url(lambda url: "login" not in url.lower(), timeout=timeout)
+    return await wait_for_backstage(page, timer)
+
+
+async def open_invite_dialog(page, timer, timeout=DIALOG_TIMEOUT):
+    """Click Add Host and wait for the id textarea."""
+    with timer.step("open_dialog"):
+        await page.click(ADD_HOST_BUTTON, timeout=timeout)
+        await page.wait_for_selector(INVITE_TEXTAREA, state="visible", timeout=timeout)
+
+
+async def submit_ids(page, ids, timer, timeout=DIALOG_TIMEOUT):
+    """Fill the textarea with one id per line and click Next once it is enabled."""
+    with timer.step("submit"):
+        await page.fill(INVITE_TEXTAREA, "\n".join(ids), timeout=timeout)
+        # click() waits for the button to be visible, stable and enabled
+        await page.locator(NEXT_BUTTON).first.click(timeout=timeout)
+
+
+async def wait_for_rows(page, ids, timer, timeout=RESULTS_TIMEOUT, settle_ms=ROWS_SETTLE_MS):
+    """Wait until the result table has a row for every id (or stopped growing)."""
+    with timer.step("results"):
+        await page.evaluate("() => { window.__rowsWatch = null; }")
+        await page.wait_for_selector(RESULT_TABLE, timeout=timeout)
+        await page.wait_for_function(
+            _ROWS_READY_JS,
+            arg=[RESULT_ROWS, [normalize_id(i) for i in ids], settle_ms],
+            timeout=timeout,
+            polling=100,
+        )
+
+
+async def extract_rows(page, selector=RESULT_ROWS):
+    """All result rows' cell texts in a single page.evaluate."""
+    return await page.evaluate(_EXTRACT_ROWS_JS, selector)
+
+
+def normalize_id(handle):
+    return handle.strip().lstrip("@").lower()
+
+
+def match_rows(rows, ids):
+    """Map each submitted id to its row, by exact handle tokens in the row text.
+
+    A row is matched through a dict of normalised ids, so "user1" never
+    claims the row of "user10" and the cost is O(rows + ids).
+    """
+    wanted = {normalize_id(i): i for i in ids}
+    matched = {}
+    for row in rows:
+        # The user cell reads "handle\nnickname"; fall back to the whole row
+        for token in re.split(r"\s+", " ".join(row["cells"]) or row["text"]):
+            uid = wanted.get(normalize_id(token))
+            if uid and uid not in matched:
+                matched[uid] = row
+                break
+    return matched
+
+
+def classify_text(text):
+    """Status key for Backstage's (Korean or English) status wording."""
+    for status, (_, keywords) in STATUSES.items():
+        if any(k in text for k in keywords):
+            return status
+    return "unknown"
+
+
+def _handle_of(item):
+    for key in HANDLE_KEYS:
+        if isinstance(item.get(key), str):
+            return item[key]
+    # {"user_info": {"display_id": ...}, "can_invite": ...}
+    for value in item.values():
+        if isinstance(value, dict):
+            for key in HANDLE_KEYS:
+                if isinstance(value.get(key), str):
+                    return value[key]
+    return None
+
+
+def _status_of(item):
+    fallback = "unknown"
+    for key in ELIGIBLE_KEYS:
+        if isinstance(item.get(key), bool):
+            if item[key]:
+                return "available"
+            fallback = "ineligible"  # refined by a bound flag or reason below
+    for key in BOUND_KEYS:
+        if item.get(key) is True:
+            return "bound"
+    for key in REASON_KEYS:
+        if isinstance(item.get(key), str) and item[key]:
+            status = classify_text(item[key])
+            if status != "unknown":
+                return status
+    return fallback
+
+
+def parse_eligibility(data, ids):
+    """Map submitted ids to status keys from an eligibility JSON response.
+
+    Walks the response for objects naming one of the ids (HANDLE_KEYS,
+    directly or in a nested user object) and reads their eligibility
+    flags and reason text; ids the response doesn't mention are left out.
+    """
+    wanted = {normalize_id(i): i for i in ids}
+    statuses = {}
+
+    def walk(node):
+        if isinstance(node, dict):
+            handle = _handle_of(node)
+            uid = wanted.get(normalize_id(handle)) if handle else None
+            if uid and uid not in statuses:
+                statuses[uid] = _status_of(node)
+                return
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(data)
+    return statuses
+
+
+class ResponseCapture:
+    """Collects Backstage eligibility responses while attached to a page.
+
+    Like crawler.handle_response, a page.on("response") handler keeps the
+    JSON bodies of live-backstage responses whose URL contains one of
+    ELIGIBILITY_URL_HINTS. With record_dir, every live-backstage JSON
+    response is also saved there as a fixture, to find or re-check the
+    endpoint offline.
+    """
+
+    def __init__(self, page, record_dir=None):
+        self.page = page
+        self.record_dir = record_dir
+        self.bodies = []
+        self.arrived = asyncio.Event()
+        self.last_arrival = 0
+        self.recorded = 0
+        page.on("response", self.on_response)
+
+    async def on_response(self, response):
+        try:
+            url = response.url
+            if BACKSTAGE_HOST not in url or "json" not in response.headers.get("content-type", ""):
+                return
+            relevant = any(h in url for h in ELIGIBILITY_URL_HINTS)
+            if not relevant and not self.record_dir:
+                return
+            data = await response.json()
+        except Exception:
+            return
+        if self.record_dir:
+            self.record(url, data)
+        if relevant:
+            self.bodies.append(data)
+            self.last_arrival = time.monotonic()
+            self.arrived.set()
+
+    def record(self, url, data):
+        os.makedirs(self.record_dir, exist_ok=True)
+        self.recorded += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.recorded:03d}.json"
+        with open(os.path.join(self.record_dir, name), "w", encoding="utf-8") as f:
+            json.dump({"url": url, "body": data}, f, ensure_ascii=False, indent=2)
+
+    def clear(self):
+        self.bodies = []
+        self.arrived.clear()
+
+    def statuses(self, ids):
+        found = {}
+        for data in self.bodies:
+            for uid, status in parse_eligibility(data, ids).items():
+                if found.get(uid, "unknown") == "unknown":
+                    found[uid] = status
+        return found
+
+    async def wait(self, ids, timer, timeout=RESULTS_TIMEOUT, settle_ms=RESPONSE_SETTLE_MS):
+        """Statuses for ids as soon as the responses cover all of them.
+
+        timeout (ms) bounds the wait for the first matching response. Once
+        one has arrived, a response that leaves ids out (e.g. invalid
+        handles) only costs settle_ms more; whatever was found is returned
+        and the caller reads the rest from the table.
+        """
+        deadline = time.monotonic() + timeout / 1000
+        with timer.step("api_results"):
+            while True:
+                found = self.statuses(ids)
+                if found:
+                    deadline = min(deadline, self.last_arrival + settle_ms / 1000)
+                remaining = deadline - time.monotonic()
+                if len(found) == len(ids) or remaining <= 0:
+                    return found
+                self.arrived.clear()
+                try:
+                    await asyncio.wait_for(self.arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    def close(self):
+        self.page.remove_listener("response", self.on_response)
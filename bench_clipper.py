@@ -0,0 +1,126 @@
+"""
+Latency benchmark for clipper_bot's Chrome round trips (macOS).
+
+Serves a stand-in live page from a temp directory, opens it in Google
+Chrome, then times what one capture asks of Chrome (read URL + title,
+press the down arrow) with a fresh osascript per call versus the
+persistent bridge, and prints p50/p99 per capture.
+
+Usage:
+    python bench_clipper.py                 # 30 captures per mode
+    python bench_clipper.py --captures 100
+"""
+import argparse
+import functools
+import http.server
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import clipper_bot
+
+STAND_IN_HANDLE = "bench_creator"
+STAND_IN_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Bench Creator (@{handle}) 님 라이브 중 | TikTok</title>
+</head>
+<body style="height: 5000px">
+<h1>Stand-in live page for bench_clipper.py</h1>
+</body>
+</html>
+"""
+
+
+def serve_stand_in(directory):
+    """Serve the stand-in page at /tiktok.com/@<handle>/live/ so TIKTOK_REGEX matches."""
+    page_dir = os.path.join(directory, "tiktok.com", f"@{STAND_IN_HANDLE}", "live")
+    os.makedirs(page_dir)
+    with open(os.path.join(page_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(STAND_IN_PAGE.format(handle=STAND_IN_HANDLE))
+
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(QuietHandler, directory=directory)
+    )
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}/tiktok.com/@{STAND_IN_HANDLE}/live/"
+
+
+def open_in_chrome(url, timeout=15):
+    subprocess.run(["open", "-a", "Google Chrome", url], check=True)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if clipper_bot.get_active_tab_snapshot()["url"].startswith(url):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def one_capture():
+    """The Chrome side of one clipper_bot batch step: tab snapshot, then next live."""
+    tab = clipper_bot.get_active_tab_snapshot()
+    if STAND_IN_HANDLE not in tab["url"] or not clipper_bot.parse_live_nickname(tab["title"]):
+        raise RuntimeError(f"Unexpected tab: {tab!r}")
+    clipper_bot.press_down_arrow()
+
+
+def measure(captures):
+    samples = []
+    for _ in range(captures):
+        start = time.perf_counter()
+        one_capture()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--captures", type=int, default=30, help="Captures per mode")
+    args = parser.parse_args()
+
+    if sys.platform != "darwin":
+        print("bench_clipper.py needs macOS with Google Chrome (osascript)")
+        sys.exit(1)
+
+    httpd, url = serve_stand_in(tempfile.mkdtemp(prefix="bench_clipper_"))
+    print(f"Stand-in page: {url}")
+    if not open_in_chrome(url):
+        print("Chrome did not show the stand-in page as its active tab")
+        sys.exit(1)
+
+    results = {}
+    clipper_bot.USE_BRIDGE = False
+    results["osascript per call"] = measure(args.captures)
+
+    clipper_bot.USE_BRIDGE = True
+    start = time.perf_counter()
+    clipper_bot.bridge.call("ping", timeout=10)
+    startup = (time.perf_counter() - start) * 1000
+    results["bridge"] = measure(args.captures)
+    clipper_bot.bridge.close()
+    httpd.shutdown()
+
+    print(f"\n{'mode':<22}{'captures':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for mode, values in results.items():
+        print(f"{mode:<22}{len(values):>10}{statistics.median(values):>10.1f}"
+              f"{percentile(values, 99):>10.1f}{max(values):>10.1f}")
+    print(f"\nBridge startup (once per clipper run): {startup:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Load benchmark for server.py.
+
+Simulates N dashboard tabs polling the server the way index.html does
+(/creators every 2s, the three status endpoints every 1.5s) against a
+synthetic creator list, then prints p50/p99 latency per endpoint.
+
+Usage:
+    python bench_server.py                  # pooled server, 20 tabs
+    python bench_server.py --legacy         # old single-threaded TCPServer
+    python bench_server.py --tabs 40 --creators 5000 --duration 20
+    python bench_server.py --check          # gzip/ETag correctness across /creators queries
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+
+import server
+import storage
+
+CREATORS_INTERVAL = 2.0
+STATUS_INTERVAL = 1.5
+STATUS_PATHS = ["/clipper/status", "/verify/status", "/dm/status"]
+
+
+def write_fixture(directory, count):
+    now = int(time.time() * 1000)
+    pending = []
+    available = []
+    unavailable = []
+    for i in range(count):
+        record = {"id": f"creator_{i:06d}", "nickname": f"Creator {i}"}
+        bucket = random.random()
+        if bucket < 0.5:
+            record.update({"status": "pending", "added_at": now - i * 1000})
+            pending.append(record)
+        elif bucket < 0.7:
+            record.update({"reason": "사용 가능", "verified_at": now - i * 1000})
+            available.append(record)
+        else:
+            record.update({"reason": "부적격", "verified_at": now - i * 1000})
+            unavailable.append(record)
+
+    with open(os.path.join(directory, storage.PENDING_FILE), "w", encoding="utf-8") as f:
+        json.dump(pending, f, ensure_ascii=False)
+    with open(os.path.join(directory, storage.VERIFIED_FILE), "w", encoding="utf-8") as f:
+        json.dump({"available": available, "unavailable": unavailable}, f, ensure_ascii=False)
+    with open(os.path.join(directory, storage.DM_STATUS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"sent": [{"id": c["id"]} for c in available[:50]], "failed": []}, f)
+
+
+class LegacyHandler(server.Handler):
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(server.Handler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(legacy):
+    if legacy:
+        httpd = socketserver.TCPServer(("127.0.0.1", 0), LegacyHandler)
+    else:
+        httpd = server.PooledHTTPServer(("127.0.0.1", 0), QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd
+
+
+class Tab(threading.Thread):
+    """One dashboard tab: a keep-alive connection per polling loop."""
+
+    def __init__(self, port, deadline, keepalive, samples, lock):
+        super().__init__(daemon=True)
+        self.port = port
+        self.deadline = deadline
+        self.keepalive = keepalive
+        self.samples = samples
+        self.lock = lock
+        self.errors = 0
+
+    def request(self, conn, path):
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+                conn.request("GET", path)
+                conn.getresponse().read()
+                conn.close()
+            else:
+                conn.request("GET", path)
+                conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.samples.setdefault(path, []).append(elapsed)
+
+    def poll_loop(self, paths, interval):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30) if self.keepalive else None
+        # Stagger tabs so they don't all fire on the same tick
+        next_at = time.time() + random.uniform(0, interval)
+        while next_at < self.deadline:
+            time.sleep(max(next_at - time.time(), 0))
+            for path in paths:
+                self.request(conn, path)
+            next_at += interval
+        if conn:
+            conn.close()
+
+    def run(self):
+        status = threading.Thread(target=self.poll_loop, args=(STATUS_PATHS, STATUS_INTERVAL), daemon=True)
+        status.start()
+        self.poll_loop(["/creators"], CREATORS_INTERVAL)
+        status.join()
+
+
+def fetch(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    if response.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return response.status, response.getheader("ETag"), json.loads(body) if body else None
+
+
+def check_recapture(port):
+    """Delete a pending creator, then capture it again the way clipper_bot does."""
+    failures = []
+    store = storage.get_store()
+    running = storage.SeenIndex()  # a clipper that was already running
+    running.seed_from(store)
+    handle = store.load_pending()[0]["id"]
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("DELETE", f"/pending/{handle}")
+    conn.getresponse().read()
+    conn.close()
+    for name, index in (("running clipper", running), ("new clipper", storage.SeenIndex())):
+        if handle in index:
+            failures.append(f"{name} still treats deleted @{handle} as captured")
+    store.add_pending_many([{"id": handle, "status": "pending", "added_at": int(time.time() * 1000)}])
+    running.add(handle)
+    if handle not in storage.SeenIndex() or not any(c["id"] == handle for c in store.load_pending()):
+        failures.append(f"@{handle} was not captured again after being deleted")
+    return failures
+
+
+def check(port, total):
+    """Ask for different /creators filters the way a browser does; returns failures."""
+    gz = {"Accept-Encoding": "gzip"}
+    failures = []
+    seen = {}
+    for status in ("pending", "available", "unavailable"):
+        code, etag, data = fetch(port, f"/creators?limit=100&status={status}", gz)
+        wrong = [c["id"] for c in data["creators"] if c["status"] != status]
+        if code != 200 or wrong:
+            failures.append(f"status={status}: HTTP {code}, {len(wrong)} records with another status")
+        if etag in seen:
+            failures.append(f"status={status} shares its ETag with status={seen[etag]}")
+        seen[etag] = status
+        # Revalidating one filter's ETag against another filter must not be a 304
+        other = "available" if status == "pending" else "pending"
+        code, _, _ = fetch(port, f"/creators?limit=100&status={other}", dict(gz, **{"If-None-Match": etag}))
+        if code != 200:
+            failures.append(f"status={other} answered {code} to status={status}'s ETag")
+    failures.extend(check_recapture(port))
+    code, _, data = fetch(port, "/creators", gz)
+    records = (data or {}).get("creators", [])
+    if code != 200 or len(records) != total:
+        failures.append(f"/creators: HTTP {code}, {len(records)} of {total} records")
+    return failures
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tabs", type=int, default=20, help="Simultaneous dashboard tabs")
+    parser.add_argument("--creators", type=int, default=3000, help="Synthetic creator count")
+    parser.add_argument("--duration", type=float, default=15, help="Benchmark length in seconds")
+    parser.add_argument("--legacy", action="store_true", help="Use the old single-threaded TCPServer")
+    parser.add_argument("--check", action="store_true", help="Only check /creators responses for mixed-up bodies")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_server_")
+    os.chdir(workdir)
+    write_fixture(workdir, args.creators)
+
+    httpd = start_server(args.legacy)
+    port = httpd.server_address[1]
+    if args.check:
+        failures = check(port, args.creators)
+        httpd.shutdown()
+        httpd.server_close()
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print("ok" if not failures else f"{len(failures)} failures")
+        raise SystemExit(1 if failures else 0)
+    mode = "legacy TCPServer" if args.legacy else f"pooled ({server.MAX_WORKERS} workers, keep-alive)"
+    print(f"Server: {mode} on port {port}")
+    print(f"Tabs: {args.tabs}, creators: {args.creators}, duration: {args.duration}s")
+
+    samples = {}
+    lock = threading.Lock()
+    deadline = time.time() + args.duration
+    tabs = [Tab(port, deadline, not args.legacy, samples, lock) for _ in range(args.tabs)]
+    for tab in tabs:
+        tab.start()
+    for tab in tabs:
+        tab.join()
+    httpd.shutdown()
+    httpd.server_close()
+
+    print(f"\n{'endpoint':<18}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    everything = []
+    for path in ["/creators"] + STATUS_PATHS:
+        values = samples.get(path, [])
+        everything.extend(values)
+        if not values:
+            continue
+        print(f"{path:<18}{len(values):>10}{statistics.median(values):>10.1f}"
+              f"{percentile(values, 99):>10.1f}{max(values):>10.1f}")
+    if everything:
+        print(f"{'all':<18}{len(everything):>10}{statistics.median(everything):>10.1f}"
+              f"{percentile(everything, 99):>10.1f}{max(everything):>10.1f}")
+    errors = sum(tab.errors for tab in tabs)
+    if errors:
+        print(f"\nErrors: {errors}")
+
+
+if __name__ == "__main__":
+    main()
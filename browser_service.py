@@ -0,0 +1,466 @@
+"""
+Long-lived Chrome shared by the Backstage workers.
+
+    python browser_service.py        # server.py starts this once
+
+Launches Chrome on ./tiktok_user_data with a local CDP port and keeps
+pages loaded on WARM_URLS. Workers lease a page over a small HTTP RPC on
+SERVICE_PORT and drive it through connect_over_cdp, so a job skips the
+Chrome cold start and usually the first Backstage load:
+
+    page, close_page = await open_page(p, BACKSTAGE_URL, launch_args, log)
+    ...
+    await close_page()
+
+When the service isn't running, open_page launches a private persistent
+context from launch_args instead, as the workers always did.
+"""
+import asyncio
+import http.server
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from app_logging import get_log
+
+USER_DATA_DIR = "./tiktok_user_data"
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.environ.get("BROWSER_SERVICE_PORT", "8092"))
+# clipper_bot reads the user's own Chrome on 9222
+CDP_PORT = int(os.environ.get("BROWSER_CDP_PORT", "9223"))
+# Pages kept loaded between jobs, and the most pages open at once
+WARM_URLS = [
+    "https://live-backstage.tiktok.com/portal/anchor/relation",
+    "https://live-backstage.tiktok.com/portal/anchor/instant-messages",
+]
+MAX_PAGES = 4
+# How long acquire waits for a free page before giving up
+ACQUIRE_TIMEOUT = 120
+# How often leases of exited workers are reclaimed
+REAP_INTERVAL = 5
+LOG_FILE = "browser.log"
+
+
+def _find_chrome_executable():
+    if sys.platform.startswith("win"):
+        candidates = [
+            os.environ.get("CHROME_PATH", ""),
+            r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+            r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+        ]
+        for path in candidates:
+            if path and os.path.exists(path):
+                return path
+        return ""
+    if sys.platform == "darwin":
+        path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+        return path if os.path.exists(path) else ""
+    for path in ("/usr/bin/google-chrome", "/usr/bin/chromium-browser", "/usr/bin/chromium"):
+        if os.path.exists(path):
+            return path
+    return ""
+
+
+def _same_page(url, other):
+    return url.split("?")[0].rstrip("/") == other.split("?")[0].rstrip("/")
+
+
+def _pid_alive(pid):
+    if sys.platform.startswith("win"):
+        # os.kill(pid, 0) would terminate the process there
+        return _pid_alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _pid_alive_windows(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Exists but belongs to someone else; any other error means it is gone
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+# --- Service ---
+
+class BrowserService:
+    """Pool of pages in one persistent context, leased to one worker at a time.
+
+    Each slot is a dict: page, target_id (the CDP id workers look the page
+    up by), warm_url, and lease/pid while leased. A released page is
+    navigated back to its warm URL in the background, which also drops
+    whatever dialog the worker left open.
+    """
+
+    def __init__(self, context, log):
+        self.context = context
+        self.log = log
+        self.slots = []
+        self.changed = asyncio.Condition()
+        self.closed = asyncio.Event()
+        context.on("close", lambda _: self.closed.set())
+
+    async def _open_slot(self, url):
+        page = await self.context.new_page()
+        session = await self.context.new_cdp_session(page)
+        info = await session.send("Target.getTargetInfo")
+        await session.detach()
+        slot = {"page": page, "target_id": info["targetInfo"]["targetId"], "warm_url": url,
+                "lease": None, "pid": None, "ready": False}
+        self.slots.append(slot)
+        return slot
+
+    async def _load(self, slot):
+        try:
+            await slot["page"].goto(slot["warm_url"], timeout=30000, wait_until="domcontentloaded")
+        except Exception as e:
+            self.log(f"Warm-up of {slot['warm_url']} failed: {e}")
+        async with self.changed:
+            slot["ready"] = True
+            self.changed.notify_all()
+
+    async def start(self):
+        # launch_persistent_context opens with one blank page; reuse it
+        blank = list(self.context.pages)
+        for url in WARM_URLS:
+            slot = await self._open_slot(url)
+            await self._load(slot)
+        for page in blank:
+            await page.close()
+        self.log(f"Warm pages ready: {', '.join(WARM_URLS)}")
+
+    def _pick(self, url):
+        idle = [s for s in self.slots if s["lease"] is None and s["ready"] and not s["page"].is_closed()]
+        for slot in idle:
+            if _same_page(slot["warm_url"], url):
+                return slot
+        return idle[0] if idle else None
+
+    async def acquire(self, url, pid, worker, timeout=ACQUIRE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        async with self.changed:
+            self.slots = [s for s in self.slots if not s["page"].is_closed()]
+            while True:
+                slot = self._pick(url)
+                if slot is None and len(self.slots) < MAX_PAGES:
+                    slot = await self._open_slot(url)
+                    slot["ready"] = True
+                if slot is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+            slot.update(lease=uuid.uuid4().hex[:12], pid=pid, worker=worker)
+
+        page = slot["page"]
+        if not _same_page(page.url, url):
+            try:
+                await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            except Exception:
+                await self.release(slot["lease"])
+                raise
+        self.log(f"Leased {slot['warm_url']} to {worker} (pid {pid})")
+        return {
+            "lease": slot["lease"],
+            "target_id": slot["target_id"],
+            "cdp": f"http://{SERVICE_HOST}:{CDP_PORT}",
+            "url": page.url,
+        }
+
+    async def release(self, lease):
+        async with self.changed:
+            slot = next((s for s in self.slots if s["lease"] == lease), None)
+            if slot is None:
+                return False
+            self.log(f"Released page from {slot.get('worker')} (pid {slot['pid']})")
+            slot.update(lease=None, pid=None, worker=None, ready=False)
+        if slot["page"].is_closed():
+            async with self.changed:
+                if slot in self.slots:
+                    self.slots.remove(slot)
+                self.changed.notify_all()
+        else:
+            asyncio.ensure_future(self._load(slot))
+        return True
+
+    async def reap(self):
+        """Reclaim pages leased by workers that exited without releasing."""
+        parent = os.getppid()
+        while True:
+            try:
+                await asyncio.wait_for(self.closed.wait(), REAP_INTERVAL)
+                self.log("Browser closed; shutting down")
+                return
+            except asyncio.TimeoutError:
+                pass
+            # server.py went away: don't outlive it and hold the profile
+            if os.getppid() != parent:
+                self.log("Server exited; shutting down")
+                return
+            for slot in list(self.slots):
+                if slot["lease"] and not _pid_alive(slot["pid"]):
+                    await self.release(slot["lease"])
+
+    async def status(self):
+        return {
+            "pages": [
+                {"warm_url": s["warm_url"], "url": s["page"].url, "leased_by": s.get("worker"), "pid": s["pid"]}
+                for s in self.slots
+            ]
+        }
+
+
+def make_handler(service, loop, log):
+    def call(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    class RpcHandler(http.server.BaseHTTPRequestHandler):
+        def send_json(self, data, status=200):
+            body = json.dumps(data, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self.send_json(call(service.status()))
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                data = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self.send_json({"status": "error", "message": "Invalid JSON"}, status=400)
+                return
+
+            if self.path == "/acquire":
+                try:
+                    lease = call(service.acquire(
+                        data.get("url", WARM_URLS[0]),
+                        int(data.get("pid", 0)),
+                        data.get("worker", "?"),
+                        float(data.get("timeout", ACQUIRE_TIMEOUT)),
+                    ))
+                except Exception as e:
+                    log(f"Acquire failed: {e}")
+                    self.send_json({"status": "error", "message": str(e)}, status=500)
+                    return
+                if lease is None:
+                    self.send_json({"status": "error", "message": "No free browser page"}, status=503)
+                    return
+                self.send_json({"status": "success", **lease})
+
+            elif self.path == "/release":
+                ok = call(service.release(data.get("lease", "")))
+                self.send_json({"status": "success" if ok else "error"}, status=200 if ok else 404)
+
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return RpcHandler
+
+
+async def serve():
+    from playwright.async_api import async_playwright
+
+    log = get_log(LOG_FILE)
+    async with async_playwright() as p:
+        launch_args = {
+            "user_data_dir": os.path.abspath(USER_DATA_DIR),
+            "headless": False,
+            "viewport": {"width": 1280, "height": 800},
+            "args": [
+                "--no-first-run",
+                "--no-default-browser-check",
+                "--disable-blink-features=AutomationControlled",
+                "--disable-dev-shm-usage",
+                f"--remote-debugging-port={CDP_PORT}",
+                f"--remote-debugging-address={SERVICE_HOST}",
+            ],
+            "ignore_default_args": ["--enable-automation"],
+        }
+        chrome_path = _find_chrome_executable()
+        if chrome_path:
+            launch_args["executable_path"] = chrome_path
+        elif sys.platform.startswith("win"):
+            launch_args["channel"] = "chrome"
+
+        log("Launching shared browser...")
+        context = await p.chromium.launch_persistent_context(**launch_args)
+        service = BrowserService(context, log)
+
+        # Listen before warming up: once the port is open, workers attach
+        # here instead of launching Chrome on the same profile
+        httpd = http.server.ThreadingHTTPServer(
+            (SERVICE_HOST, SERVICE_PORT), make_handler(service, asyncio.get_running_loop(), log)
+        )
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        log(f"Browser service on http://{SERVICE_HOST}:{SERVICE_PORT} (CDP {CDP_PORT})")
+        try:
+            await service.start()
+            await service.reap()
+        finally:
+            httpd.shutdown()
+            await context.close()
+
+
+# --- Worker side ---
+
+def wait_until_listening(timeout, process=None):
+    """True once the service accepts connections; False after timeout or if process exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            socket.create_connection((SERVICE_HOST, SERVICE_PORT), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _rpc(path, payload, timeout):
+    request = urllib.request.Request(
+        f"http://{SERVICE_HOST}:{SERVICE_PORT}{path}",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def acquire(url, worker, timeout=ACQUIRE_TIMEOUT):
+    """Lease a warm page; None when the service isn't running.
+
+    Raises RuntimeError if the service is up but no page came free in
+    time (the profile is in use, so launching Chrome ourselves would fail).
+    """
+    payload = {"url": url, "pid": os.getpid(), "worker": worker, "timeout": timeout}
+    try:
+        return _rpc("/acquire", payload, timeout + 30)
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Browser service: {json.loads(e.read() or b'{}').get('message', e.code)}")
+    except OSError:
+        return None
+
+
+def release(lease):
+    try:
+        _rpc("/release", {"lease": lease["lease"]}, 10)
+    except OSError:
+        pass
+
+
+def _worker_name():
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0] or "worker"
+
+
+async def _find_page(browser, target_id):
+    for context in browser.contexts:
+        for page in context.pages:
+            session = await context.new_cdp_session(page)
+            try:
+                info = await session.send("Target.getTargetInfo")
+            finally:
+                await session.detach()
+            if info["targetInfo"]["targetId"] == target_id:
+                return page
+    raise RuntimeError(f"Leased page {target_id} not found over CDP")
+
+
+async def open_page(p, url, launch_args, log=print):
+    """(page, close) from the browser service, or from a private launch as fallback."""
+    lease = await asyncio.to_thread(acquire, url, _worker_name())
+    if lease is None:
+        context = await p.chromium.launch_persistent_context(**launch_args)
+        page = context.pages[0] if context.pages else await context.new_page()
+        return page, context.close
+
+    browser = await p.chromium.connect_over_cdp(lease["cdp"])
+    try:
+        page = await _find_page(browser, lease["target_id"])
+    except Exception:
+        await asyncio.to_thread(release, lease)
+        await browser.close()
+        raise
+    log(f"Using warm browser page ({lease['url']})")
+
+    async def close():
+        await asyncio.to_thread(release, lease)
+        # Only disconnects: the service keeps the browser and the page
+        await browser.close()
+
+    return page, close
+
+
+def open_page_sync(p, url, launch_args, log=print):
+    """open_page for playwright.sync_api callers."""
+    lease = acquire(url, _worker_name())
+    if lease is None:
+        context = p.chromium.launch_persistent_context(**launch_args)
+        page = context.pages[0] if context.pages else context.new_page()
+        return page, context.close
+
+    browser = p.chromium.connect_over_cdp(lease["cdp"])
+    for context in browser.contexts:
+        for page in context.pages:
+            session = context.new_cdp_session(page)
+            target_id = session.send("Target.getTargetInfo")["targetInfo"]["targetId"]
+            session.detach()
+            if target_id == lease["target_id"]:
+                log(f"Using warm browser page ({lease['url']})")
+
+                def close():
+                    release(lease)
+                    browser.close()
+
+                return page, close
+    release(lease)
+    browser.close()
+    raise RuntimeError(f"Leased page {lease['target_id']} not found over CDP")
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,174 @@
+import json
+import os
+import select
+import subprocess
+import threading
+import time
+import urllib.request
+
+# JXA program run by one long-lived osascript process. It reads one JSON
+# command per line on stdin and answers each with one JSON line on stdout;
+# the Chrome and System Events handles are resolved once, not per call.
+BRIDGE_SCRIPT = r"""
+ObjC.import('Foundation');
+
+const stdin = $.NSFileHandle.fileHandleWithStandardInput;
+const stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+const chrome = Application('Google Chrome');
+const systemEvents = Application('System Events');
+const app = Application.currentApplication();
+app.includeStandardAdditions = true;
+
+function reply(result) {
+    const line = JSON.stringify(result) + '\n';
+    stdout.writeData($(line).dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+function handle(command) {
+    switch (command.op) {
+        case 'tab': {
+            if (chrome.windows.length === 0) {
+                return {url: '', title: ''};
+            }
+            const tab = chrome.windows[0].activeTab;
+            return {url: tab.url(), title: tab.title(), id: tab.id()};
+        }
+        case 'key':
+            systemEvents.keyCode(command.code);
+            return {};
+        case 'notify':
+            app.displayNotification(command.message, {withTitle: command.title, soundName: command.sound});
+            return {};
+        case 'ping':
+            return {};
+    }
+    return {error: 'unknown op: ' + command.op};
+}
+
+function run() {
+    let buffer = '';
+    while (true) {
+        const data = stdin.availableData;
+        if (data.length === 0) {
+            return;
+        }
+        buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline);
+            buffer = buffer.slice(newline + 1);
+            let result;
+            try {
+                result = handle(JSON.parse(line));
+            } catch (e) {
+                result = {error: String(e)};
+            }
+            reply(result);
+        }
+    }
+}
+"""
+
+
+class ChromeBridge:
+    """One osascript process that answers Chrome commands over a pipe.
+
+    Replaces an osascript spawn (plus AppleScript compilation) per call with
+    a JSON line round trip. The process starts on first use; if a call fails
+    or times out it is killed, the call returns None, and the next call
+    starts a fresh one, so callers can fall back to plain osascript.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.proc = None
+        self.buffer = b""
+
+    def _start(self):
+        self.proc = subprocess.Popen(
+            ["osascript", "-l", "JavaScript", "-e", BRIDGE_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.buffer = b""
+
+    def _read_line(self, timeout):
+        fd = self.proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("bridge did not answer")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise EOFError("bridge exited")
+                self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line
+
+    def call(self, op, timeout=1.5, **args):
+        """Send one command; returns the reply dict, or None on failure."""
+        with self.lock:
+            try:
+                if self.proc is None or self.proc.poll() is not None:
+                    self._start()
+                self.proc.stdin.write((json.dumps({"op": op, **args}) + "\n").encode())
+                self.proc.stdin.flush()
+                result = json.loads(self._read_line(timeout))
+            except (OSError, ValueError, TimeoutError, EOFError):
+                # A late answer would desync the pipe: start over next time
+                self._kill()
+                return None
+            if "error" in result:
+                return None
+            return result
+
+    def active_tab(self):
+        """URL, title and id of Chrome's active tab in one round trip."""
+        return self.call("tab")
+
+    def key_code(self, code):
+        return self.call("key", code=code) is not None
+
+    def notify(self, title, message, sound="Pop"):
+        return self.call("notify", title=title, message=message, sound=sound) is not None
+
+    def _kill(self):
+        if self.proc is not None:
+            try:
+                self.proc.kill()
+                self.proc.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.proc = None
+
+    def close(self):
+        with self.lock:
+            if self.proc is not None:
+                try:
+                    self.proc.stdin.close()
+                    self.proc.wait(timeout=1)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+
+def cdp_page_targets(port, timeout=0.5):
+    """Open tabs from Chrome's DevTools HTTP endpoint, or None if unreachable.
+
+    Returns [{"id", "url", "title"}, ...] in Chrome's order, which lists
+    the most recently focused tab first.
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=timeout) as resp:
+            targets = json.loads(resp.read())
+    except (OSError, ValueError):
+        return None
+    return [
+        {"id": t.get("id"), "url": t.get("url", ""), "title": t.get("title", "")}
+        for t in targets
+        if t.get("type") == "page"
+    ]
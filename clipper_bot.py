@@ -1,45 +1,65 @@
 import time
 import re
-import json
 import os
 import sys
 import subprocess
 import ctypes
 import argparse
+import queue
+import signal
+import threading
 from pynput import keyboard
 from pynput.keyboard import Controller, Key
 
+from app_logging import get_log
+from chrome_bridge import ChromeBridge, cdp_page_targets
+from storage import CLIPPER_STATUS_FILE, SeenIndex, get_store, write_json_atomic
+
 # Configuration
 TIKTOK_REGEX = r"tiktok\.com/@([a-zA-Z0-9_.]+)"
-PENDING_FILE = "pending_creators.json"
 HOTKEY = keyboard.Key.ctrl_r  # Right Ctrl key (macOS/Linux)
 WINDOWS_HOTKEY_LABEL = "Ctrl + Space"
+STOP_HOTKEY = keyboard.Key.shift_r  # Right Shift cancels the running batch
+# Hotkey presses while a batch runs queue up to this many more batches
+MAX_QUEUED_BATCHES = 1
 # Speed tuning
 HOTKEY_COOLDOWN = 0.25
-NEXT_DELAY = 0.05
-DUPLICATE_DELAY = 0.02
+# After moving to the next live, poll the active tab until it changes:
+# backoff from NEXT_LIVE_POLL_MIN to NEXT_LIVE_POLL_MAX, up to NEXT_LIVE_TIMEOUT
+NEXT_LIVE_TIMEOUT = 3.0
+NEXT_LIVE_POLL_MIN = 0.02
+NEXT_LIVE_POLL_MAX = 0.25
+# Extra time for the title to follow a URL change (nickname comes from it)
+TITLE_GRACE = 0.3
 ENABLE_NICKNAME = True
 BATCH_MAX = 30
-BATCH_STEP_DELAY = 0.08
+BATCH_STEP_DELAY = 0.08  # only when the page was not advanced
+# Captures are saved in the background, WRITE_BATCH_SIZE at a time or
+# every WRITE_INTERVAL seconds, whichever comes first
+WRITE_BATCH_SIZE = 20
+WRITE_INTERVAL = 0.5
+# A failed save (e.g. the data file locked by the server) is retried after
+# each of these waits before its creators are given up on
+WRITE_RETRY_DELAYS = (1, 2, 4)
 LOG_FILE = "clipper.log"
+# macOS: talk to Chrome through one long-lived osascript process
+USE_BRIDGE = True
+DOWN_ARROW_KEY_CODE = 125
+# Windows: Chrome's DevTools port (start Chrome with --remote-debugging-port)
+CHROME_DEBUG_PORT = int(os.environ.get("CHROME_DEBUG_PORT", "9222"))
 
 IS_WINDOWS = sys.platform.startswith("win")
 kb = Controller()
+bridge = ChromeBridge()
 
-def log(msg):
-    timestamp = time.strftime("%H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line)
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except:
-        pass
+log = get_log(LOG_FILE)
 
 def show_notification(title, message, sound="Pop"):
     if IS_WINDOWS:
         print(f"[Notify] {title}: {message}")
         return
+    if USE_BRIDGE and bridge.notify(title, message, sound):
+        return
     script = f'display notification "{message}" with title "{title}" sound name "{sound}"'
     subprocess.run(["osascript", "-e", script], capture_output=True)
 
@@ -160,6 +180,92 @@ def focus_chrome_window():
     except Exception:
         return False
 
+def get_active_tab_snapshot():
+    """Return {"url", "title", "id"} of Chrome's active tab in one query.
+
+    macOS: one bridge round trip (one osascript call per field without it).
+    Windows: the DevTools endpoint when Chrome runs with
+    --remote-debugging-port, otherwise the address-bar copy for the URL;
+    the title comes from the window caption either way. id is None when
+    the platform can't tell tabs apart.
+    """
+    if IS_WINDOWS:
+        return get_active_tab_snapshot_windows()
+    if USE_BRIDGE:
+        tab = bridge.active_tab()
+        if tab is not None:
+            return {
+                "url": (tab.get("url") or "").strip(),
+                "title": (tab.get("title") or "").strip(),
+                "id": tab.get("id"),
+            }
+    return {"url": get_chrome_url(), "title": get_chrome_title(), "id": None}
+
+def get_active_tab_snapshot_windows(peek=False):
+    title = _get_chrome_title_windows()
+    pages = cdp_page_targets(CHROME_DEBUG_PORT)
+    if pages:
+        # /json/list puts the most recently focused tab first
+        tab = next((p for p in pages if p["title"] == title), pages[0])
+        return {"url": tab["url"], "title": tab["title"], "id": tab["id"]}
+    if peek:
+        # Don't drive the address bar just to watch for a change
+        return {"url": None, "title": title, "id": None}
+    return {"url": get_chrome_url_windows(), "title": title, "id": None}
+
+def peek_active_tab():
+    """Snapshot cheap enough to poll; url is None where reading it needs keystrokes."""
+    if IS_WINDOWS:
+        return get_active_tab_snapshot_windows(peek=True)
+    return get_active_tab_snapshot()
+
+def tab_changed(previous, tab):
+    if tab["url"] and previous["url"]:
+        return tab["url"] != previous["url"]
+    return bool(tab["title"]) and tab["title"] != previous["title"]
+
+def wait_for_next_live(previous):
+    """Poll with backoff until the active tab leaves previous.
+
+    Returns (snapshot, waited_seconds, changed). changed is False when
+    NEXT_LIVE_TIMEOUT passed first; the snapshot is then the last one seen.
+    """
+    start = time.monotonic()
+    delay = NEXT_LIVE_POLL_MIN
+    changed_at = None
+    while True:
+        tab = peek_active_tab()
+        elapsed = time.monotonic() - start
+        if changed_at is None and tab_changed(previous, tab):
+            changed_at = elapsed
+        if changed_at is not None:
+            # The URL usually changes first; give the title a moment to follow
+            title_ready = not previous["title"] or tab["title"] != previous["title"]
+            if title_ready or elapsed - changed_at >= TITLE_GRACE:
+                break
+        elif elapsed >= NEXT_LIVE_TIMEOUT:
+            break
+        time.sleep(delay)
+        delay = min(delay * 1.5, NEXT_LIVE_POLL_MAX)
+    if tab["url"] is None:
+        tab = get_active_tab_snapshot()
+    waited = changed_at if changed_at is not None else time.monotonic() - start
+    return tab, waited, changed_at is not None
+
+def _get_chrome_title_windows():
+    """Page title from the Chrome window caption ("<title> - Google Chrome")."""
+    try:
+        user32 = ctypes.windll.user32
+        foreground = user32.GetForegroundWindow()
+        titles = _find_chrome_windows()
+        chrome_titles = [(hwnd, t) for hwnd, t in titles if "chrome" in t.lower()]
+        if not chrome_titles:
+            return ""
+        title = next((t for hwnd, t in chrome_titles if hwnd == foreground), chrome_titles[0][1])
+        return title.rsplit(" - ", 1)[0].strip()
+    except Exception:
+        return ""
+
 def get_chrome_url():
     """Get URL directly from Chrome without simulating keystrokes."""
     if IS_WINDOWS:
@@ -238,14 +344,13 @@ def press_down_arrow():
         kb.press(Key.down)
         kb.release(Key.down)
         return
-    script = 'tell application "System Events" to key code 125'
+    if USE_BRIDGE and bridge.key_code(DOWN_ARROW_KEY_CODE):
+        return
+    script = f'tell application "System Events" to key code {DOWN_ARROW_KEY_CODE}'
     subprocess.run(["osascript", "-e", script], capture_output=True)
 
-def get_live_nickname():
-    """Get streamer nickname from Chrome tab title."""
-    if IS_WINDOWS:
-        return ""
-    # Get page title - usually "닉네임 is LIVE | TikTok" or "닉네임의 LIVE | TikTok"
+def get_chrome_title():
+    """Get the active Chrome tab title with a one-off osascript call."""
     script = '''
     tell application "Google Chrome"
         if (count of windows) > 0 then
@@ -257,8 +362,14 @@ def get_live_nickname():
     '''
     try:
         result = subprocess.run(["osascript", "-e", script], capture_output=True, text=True, timeout=1.0)
-        title = result.stdout.strip()
+        return result.stdout.strip()
+    except:
+        return ""
 
+def parse_live_nickname(title):
+    """Extract the streamer nickname from a live tab title."""
+    # Title is usually "닉네임 is LIVE | TikTok" or "닉네임의 LIVE | TikTok"
+    try:
         if not title or "tiktok" not in title.lower():
             return ""
 
@@ -291,26 +402,102 @@ def get_live_nickname():
     except:
         return ""
 
-def load_pending():
-    if os.path.exists(PENDING_FILE):
-        try:
-            with open(PENDING_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return []
+class CaptureWriter:
+    """Saves captured creators on a background thread.
+
+    The capture loop only queues creators and moves on; this thread writes
+    them with one add_pending_many() per WRITE_BATCH_SIZE creators or
+    WRITE_INTERVAL seconds. flush() waits until everything queued so far is
+    written and returns how many were new since the last flush.
+
+    Handles enter the persistent dedup index only once their creators are
+    saved; until then is_seen() finds them in an in-memory set. A failed
+    write is retried after WRITE_RETRY_DELAYS; if it still fails (or the
+    process crashes first) the handles stay out of the index, so the
+    creator is captured again the next time its live comes up.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.added = 0
+        self.unsaved = set()
+        self.thread = None
+
+    def is_seen(self, username):
+        with self.lock:
+            return username.lower() in self.unsaved or username in load_seen_ids()
+
+    def submit(self, creator):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.unsaved.add(creator["id"].lower())
+        self.queue.put(creator)
+
+    def run(self):
+        while True:
+            batch = []
+            item = self.queue.get()
+            deadline = time.monotonic() + WRITE_INTERVAL
+            while True:
+                if isinstance(item, threading.Event):
+                    # Flush marker: write what came before it, then release the waiter
+                    self.write(batch)
+                    batch = []
+                    item.set()
+                else:
+                    batch.append(item)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self.write(batch)
 
-def save_pending(creators):
-    with open(PENDING_FILE, "w", encoding="utf-8") as f:
-        json.dump(creators, f, ensure_ascii=False, indent=2)
+    def write(self, batch):
+        if not batch:
+            return
+        handles = [c["id"] for c in batch]
+        for delay in WRITE_RETRY_DELAYS + (None,):
+            try:
+                added = get_store().add_pending_many(batch)
+                break
+            except Exception as e:
+                if delay is None:
+                    log(f"Error: Could not save {len(batch)} creators, dropping them: {e}")
+                    with self.lock:
+                        self.unsaved.difference_update(h.lower() for h in handles)
+                    return
+                log(f"Warn: Could not save {len(batch)} creators, retrying in {delay}s: {e}")
+                time.sleep(delay)
+        with self.lock:
+            load_seen_ids().add_many(handles)
+            self.unsaved.difference_update(h.lower() for h in handles)
+            self.added += added
+        log(f"Saved {added} new of {len(batch)} captured")
+
+    def flush(self, timeout=10):
+        with self.lock:
+            started = self.thread is not None
+        if started:
+            done = threading.Event()
+            self.queue.put(done)
+            if not done.wait(timeout):
+                log("Warn: Saving captures is taking longer than expected")
+        with self.lock:
+            added, self.added = self.added, 0
+        return added
+
+writer = CaptureWriter()
 
 def add_creator(username, nickname=""):
-    creators = load_pending()
-
-    if any(c["id"] == username for c in creators):
-        print(f"[Skip] @{username} already in list")
-        return False
-
+    """Queue a creator for the background writer."""
     creator_data = {
         "id": username,
         "status": "pending",
@@ -318,24 +505,27 @@ def add_creator(username, nickname=""):
     }
     if nickname:
         creator_data["nickname"] = nickname
-
-    creators.append(creator_data)
-    save_pending(creators)
+    writer.submit(creator_data)
 
     display_name = f"@{username}" + (f" ({nickname})" if nickname else "")
-    print(f"[Added] {display_name}")
-    show_notification("Creator Added", display_name, "Pop")
-    return True
+    print(f"[Captured] {display_name}")
 
-session_ids = set()
+seen_ids = None
 last_trigger = 0
-is_running = False
 ctrl_l_down = False
 
-def capture_once():
-    log("Capturing...")
-
-    url = get_chrome_url()
+def load_seen_ids():
+    """Open the persistent dedup index, seeded with every known creator."""
+    global seen_ids
+    if seen_ids is None:
+        seen_ids = SeenIndex()
+        seeded = seen_ids.seed_from(get_store())
+        log(f"Dedup index: {len(seen_ids)} known creators ({seeded} new from storage)")
+    return seen_ids
+
+def capture_snapshot(tab):
+    """Handle one active-tab snapshot: record the creator, move to the next live."""
+    url = tab["url"]
     if not url:
         log("Error: Could not get Chrome URL")
         show_notification("Error", "Open TikTok in Chrome", "Basso")
@@ -352,86 +542,231 @@ def capture_once():
 
     username = match.group(1)
 
-    if username in session_ids:
+    if writer.is_seen(username):
         log(f"Skip: @{username} already captured")
-        if DUPLICATE_DELAY > 0:
-            time.sleep(DUPLICATE_DELAY)
         press_down_arrow()
         return False, "duplicate"
 
-    session_ids.add(username)
-
     nickname = ""
     if ENABLE_NICKNAME:
-        nickname = get_live_nickname()
+        nickname = parse_live_nickname(tab["title"])
         if nickname:
             log(f"Nickname: {nickname}")
 
-    added = add_creator(username, nickname)
-    if added:
-        if NEXT_DELAY > 0:
-            time.sleep(NEXT_DELAY)
-        press_down_arrow()
-        log("Auto: Next live")
-        return True, "added"
+    add_creator(username, nickname)
+    press_down_arrow()
+    log("Auto: Next live")
+    return True, "added"
+
+class BatchWorker:
+    """Runs capture batches on a dedicated thread.
+
+    The hotkey listener only queues batch requests, so it never blocks and
+    stop presses are always seen. cancel() stops the running batch after
+    its current step and drops queued ones: every request carries the
+    cancel generation it was made in, and each batch gets a fresh token.
+    State and live counts go to CLIPPER_STATUS_FILE for /clipper/status.
+    """
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.token = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.report("idle")
+
+    def request(self, max_count):
+        with self.lock:
+            if self.requests.qsize() >= MAX_QUEUED_BATCHES + (self.token is None):
+                return False
+            self.requests.put((self.generation, max_count))
+        self.report("running" if self.token else "idle")
+        return True
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            if self.token:
+                self.token.set()
+                return True
+        return False
+
+    def close(self):
+        """Finish queued batches (unless cancelled), then stop the thread."""
+        self.requests.put(None)
+        self.thread.join()
+        self.report("stopped")
+
+    def run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            generation, max_count = item
+            with self.lock:
+                if generation != self.generation:
+                    continue  # cancelled while queued
+                self.token = threading.Event()
+            try:
+                run_batch(max_count, self.token, self.report_progress)
+            except Exception as e:
+                log(f"Error: Batch failed: {e}")
+            finally:
+                with self.lock:
+                    self.token = None
+                self.report("idle")
+
+    def report_progress(self, progress):
+        with self.lock:
+            cancelling = self.token is not None and self.token.is_set()
+        self.report("cancelling" if cancelling else "running", progress)
+
+    def report(self, state, progress=None):
+        status = {
+            "pid": os.getpid(),
+            "state": state,
+            "queued": self.requests.qsize(),
+            "updated_at": int(time.time() * 1000),
+        }
+        if progress is not None:
+            status["batch"] = progress
+        try:
+            write_json_atomic(CLIPPER_STATUS_FILE, status, indent=None)
+        except OSError:
+            pass
 
-    return False, "not_added"
+worker = BatchWorker()
 
 def on_hotkey():
-    global session_ids, last_trigger, is_running
+    global last_trigger
 
     now = time.time()
     if now - last_trigger < HOTKEY_COOLDOWN:
         return
     last_trigger = now
-    if is_running:
-        log("Skip: Batch already running")
-        return
-    is_running = True
-
-    log("Hotkey pressed. Starting batch...")
-    run_batch(BATCH_MAX)
-    is_running = False
-
-def run_batch(max_count):
-    added_count = 0
+    if worker.request(BATCH_MAX):
+        log("Hotkey pressed. Batch queued")
+    else:
+        log("Skip: Batch already running and queued")
+
+def on_stop_hotkey():
+    if worker.cancel():
+        log("Stop pressed. Cancelling batch...")
+
+def run_batch(max_count, cancel=None, on_progress=None):
+    """Capture up to max_count lives; stops early once cancel is set.
+
+    on_progress, if given, is called with the batch counts after each step.
+    """
+    captured_count = 0
+    waits = []
+    timeouts = 0
+    started = time.monotonic()
+    progress = {"max": max_count, "step": 0, "captured": 0, "duplicates": 0,
+                "started_at": int(time.time() * 1000)}
+    if on_progress:
+        on_progress(dict(progress))
+    log("Capturing...")
+    tab = get_active_tab_snapshot()
     for i in range(max_count):
-        added, reason = capture_once()
-        if added:
-            added_count += 1
+        if cancel is not None and cancel.is_set():
+            log("Batch cancelled")
+            break
+        captured, reason = capture_snapshot(tab)
+        if captured:
+            captured_count += 1
+        progress["step"] = i + 1
+        progress["captured"] = captured_count
+        if reason == "duplicate":
+            progress["duplicates"] += 1
+        if on_progress:
+            on_progress(dict(progress))
         if reason == "no_url":
             break
-        if BATCH_STEP_DELAY > 0:
-            time.sleep(BATCH_STEP_DELAY)
-
-    log(f"Batch done. Added {added_count}/{max_count}")
+        if i == max_count - 1:
+            break
+        if reason in ("added", "duplicate"):
+            # capture_snapshot moved to the next live: wait for it to show up
+            tab, waited, changed = wait_for_next_live(tab)
+            waits.append(waited)
+            if not changed:
+                timeouts += 1
+                log(f"Warn: Next live did not load within {NEXT_LIVE_TIMEOUT}s")
+        else:
+            if BATCH_STEP_DELAY > 0:
+                time.sleep(BATCH_STEP_DELAY)
+            tab = get_active_tab_snapshot()
+        log("Capturing...")
+
+    added_count = writer.flush()
+    minutes = max(time.monotonic() - started, 1e-6) / 60
+    log(f"Batch done. Added {added_count}/{max_count} "
+        f"(captured {captured_count}, {captured_count / minutes:.0f}/min)")
+    if waits:
+        ordered = sorted(waits)
+        log(f"Next-live wait: p50 {ordered[len(ordered) // 2] * 1000:.0f}ms, "
+            f"max {ordered[-1] * 1000:.0f}ms, timeouts {timeouts}/{len(waits)}")
+    if on_progress:
+        progress["added"] = added_count
+        on_progress(dict(progress))
     show_notification("Batch Done", f"Added {added_count}/{max_count}", "Pop")
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--batch", action="store_true", help="Run one batch without hotkey")
     parser.add_argument("--max", type=int, default=BATCH_MAX, help="Max creators to capture in batch")
+    parser.add_argument("--no-bridge", action="store_true", help="Spawn osascript per call instead of the bridge")
     args = parser.parse_args()
 
+    global USE_BRIDGE
+    if args.no_bridge:
+        USE_BRIDGE = False
+
     log("=" * 50)
     log("Clipper Bot - One Key Capture")
     log("=" * 50)
+    load_seen_ids()
+    worker.start()
+    listener = None
+
+    def on_terminate(signum, frame):
+        # /clipper/stop: finish the current step, save captures, then exit
+        worker.cancel()
+        if listener:
+            listener.stop()
+
+    signal.signal(signal.SIGTERM, on_terminate)
 
     if args.batch:
         log(f"Batch mode: capturing up to {args.max}")
         log("(Use Chrome for TikTok live)")
-        run_batch(args.max)
+        worker.request(args.max)
+        try:
+            worker.close()
+        except KeyboardInterrupt:
+            worker.cancel()
+            worker.close()
+        writer.flush()
         return
 
     if IS_WINDOWS:
         log(f"Press {WINDOWS_HOTKEY_LABEL} to auto-capture up to {BATCH_MAX}")
     else:
         log(f"Press Right Ctrl to auto-capture up to {BATCH_MAX}")
+    log("Press Right Shift to cancel a running batch")
     log("(Use Chrome for TikTok live)")
     log("Press Ctrl+C to stop")
 
     def on_press(key):
         global ctrl_l_down
+        if key == STOP_HOTKEY:
+            on_stop_hotkey()
+            return
         if IS_WINDOWS:
             if key == Key.ctrl_l:
                 ctrl_l_down = True
@@ -452,6 +787,10 @@ def main():
             listener.join()
         except KeyboardInterrupt:
             print("\n\nClipper Bot stopped.")
+    worker.cancel()
+    worker.close()
+    # A batch that failed midway leaves captures queued
+    writer.flush()
 
 if __name__ == "__main__":
     main()
@@ -3,10 +3,11 @@ import random
 import asyncio
 import sys
 import os
-import json
 import math
 from playwright.async_api import async_playwright
 
+from storage import write_json_atomic
+
 USER_DATA_DIR = "./tiktok_user_data"
 OUTPUT_FILE = "streamers_data.json"
 
@@ -134,8 +135,7 @@ async def crawl_tiktok_live():
                 }
                 print(f"    ✨ Captured: {uid}")
                 if len(collected_streamers) % 2 == 0:
-                     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-                        json.dump(list(collected_streamers.values()), f, ensure_ascii=False, indent=2)
+                    write_json_atomic(OUTPUT_FILE, list(collected_streamers.values()))
 
         page.on("response", handle_response)
         
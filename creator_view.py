@@ -0,0 +1,276 @@
+import bisect
+import json
+import threading
+from collections import Counter
+
+# Sort priority: available first, then pending, then unavailable
+STATUS_PRIORITY = {"available": 0, "pending": 1, "unavailable": 2}
+
+
+def normalize(status, c):
+    """Convert a pending/verified file record into a /creators record."""
+    creator = {"id": c["id"], "status": status}
+    if status == "pending":
+        creator["added_at"] = c.get("added_at", 0)
+    else:
+        creator["reason"] = c.get("reason", "사용 가능" if status == "available" else "")
+        creator["verified_at"] = c.get("verified_at", 0)
+    if c.get("nickname"):
+        creator["nickname"] = c["nickname"]
+    return creator
+
+
+def source_lists(pending, verified):
+    """Return {status: raw list}, supporting both verified file formats."""
+    return {
+        "pending": pending,
+        "available": verified.get("available", []) or verified.get("available_creators", []),
+        "unavailable": verified.get("unavailable", []) or verified.get("unavailable_creators", []),
+    }
+
+
+def sort_key(creator):
+    priority = STATUS_PRIORITY.get(creator.get("status"), 1)
+    val = creator.get("added_at") or creator.get("verified_at") or 0
+    if isinstance(val, str):
+        val = 0
+    return (priority, -val)  # Sort by priority first, then newest
+
+
+def fingerprint(creator):
+    return tuple(sorted(creator.items()))
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def search_grams(creator):
+    """Trigrams of id and nickname, indexed separately so none span both."""
+    return trigrams(creator["id"]) | trigrams(creator.get("nickname") or "")
+
+
+def matches(creator, q):
+    return q in creator["id"].lower() or q in (creator.get("nickname") or "").lower()
+
+
+def encode_cursor(key):
+    return "_".join(str(part) for part in key)
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor; raises ValueError if malformed."""
+    priority, neg_time, seq = cursor.split("_")
+    neg_time = float(neg_time)
+    if neg_time.is_integer():
+        neg_time = int(neg_time)
+    return (int(priority), neg_time, int(seq))
+
+
+class CreatorView:
+    """Merged and sorted /creators list, maintained incrementally.
+
+    Records live in a list kept sorted by (priority, -time, seq); seq is an
+    insertion counter that makes keys unique and keeps ties in source order.
+    Locating a record is a bisect, so a single add or delete never re-sorts.
+    The serialized response body is cached until the next change.
+
+    A trigram index over id and nickname serves substring search; counts
+    per status are kept alongside so stats never need the full list.
+
+    on_change, if given, is called as on_change(version, upserts, removed,
+    counts) after every change, where upserts are the current records of the
+    affected creators and removed are [status, id] pairs no longer present.
+    """
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.lock = threading.Lock()
+        self.keys = []
+        self.records = []
+        # status -> fingerprint -> [key, ...]
+        self.entries = {status: {} for status in STATUS_PRIORITY}
+        # (status, id) -> {key, ...}
+        self.by_id = {}
+        # status -> raw list object the view was last synced against
+        self.sources = {}
+        # trigram -> {seq, ...}; seq -> key
+        self.grams = {}
+        self.key_of_seq = {}
+        self.counts = {status: 0 for status in STATUS_PRIORITY}
+        self.seq = 0
+        self.version = 0
+        self._body = None
+        self._body_version = -1
+
+    def _insert(self, creator):
+        self.seq += 1
+        key = sort_key(creator) + (self.seq,)
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.records.insert(index, creator)
+        status = creator["status"]
+        self.entries[status].setdefault(fingerprint(creator), []).append(key)
+        self.by_id.setdefault((status, creator["id"]), set()).add(key)
+        self.counts[status] += 1
+        self.key_of_seq[self.seq] = key
+        for gram in search_grams(creator):
+            self.grams.setdefault(gram, set()).add(self.seq)
+
+    def _remove_key(self, key):
+        index = bisect.bisect_left(self.keys, key)
+        creator = self.records[index]
+        del self.keys[index]
+        del self.records[index]
+        status = creator["status"]
+        fp = fingerprint(creator)
+        keys = self.entries[status][fp]
+        keys.remove(key)
+        if not keys:
+            del self.entries[status][fp]
+        ids = self.by_id[(status, creator["id"])]
+        ids.discard(key)
+        if not ids:
+            del self.by_id[(status, creator["id"])]
+        self.counts[status] -= 1
+        seq = key[-1]
+        del self.key_of_seq[seq]
+        for gram in search_grams(creator):
+            postings = self.grams[gram]
+            postings.discard(seq)
+            if not postings:
+                del self.grams[gram]
+        return creator
+
+    def sync(self, pending, verified):
+        """Bring the view in line with the current pending/verified data.
+
+        Lists that are the same object as last time (the JSON cache hands
+        back the same object while a file is unchanged) are skipped; changed
+        lists are diffed against the view and only the difference is applied.
+        """
+        with self.lock:
+            touched = set()
+            for status, raw in source_lists(pending, verified).items():
+                if self.sources.get(status) is raw:
+                    continue
+                self.sources[status] = raw
+
+                wanted = {}
+                counts = Counter()
+                for c in raw:
+                    creator = normalize(status, c)
+                    fp = fingerprint(creator)
+                    counts[fp] += 1
+                    wanted.setdefault(fp, creator)
+
+                current = self.entries[status]
+                for fp, keys in list(current.items()):
+                    surplus = len(keys) - counts.get(fp, 0)
+                    for key in keys[len(keys) - surplus:] if surplus > 0 else []:
+                        creator = self._remove_key(key)
+                        touched.add((status, creator["id"]))
+                for fp, count in counts.items():
+                    for _ in range(count - len(current.get(fp, []))):
+                        self._insert(dict(wanted[fp]))
+                        touched.add((status, wanted[fp]["id"]))
+            if touched:
+                self._changed(touched)
+
+    def _changed(self, touched):
+        self.version += 1
+        if not self.on_change:
+            return
+        upserts = []
+        removed = []
+        for status, creator_id in touched:
+            keys = self.by_id.get((status, creator_id))
+            if keys:
+                upserts.append(self.records[bisect.bisect_left(self.keys, min(keys))])
+            else:
+                removed.append([status, creator_id])
+        self.on_change(self.version, upserts, removed, self._counts())
+
+    def remove(self, status, creator_id):
+        """Drop every record for creator_id with the given status."""
+        with self.lock:
+            keys = self.by_id.get((status, creator_id))
+            if not keys:
+                return False
+            for key in list(keys):
+                self._remove_key(key)
+            self._changed({(status, creator_id)})
+            return True
+
+    def versioned_body(self):
+        """Serialized {"creators": [...]} response as (version, body).
+
+        The body is cached per version; both are read under one lock so
+        they always agree.
+        """
+        with self.lock:
+            if self._body_version != self.version:
+                self._body = json.dumps({"creators": self.records}, ensure_ascii=False).encode()
+                self._body_version = self.version
+            return self.version, self._body
+
+    def _counts(self):
+        counts = dict(self.counts)
+        counts["total"] = len(self.records)
+        return counts
+
+    def versioned_counts(self):
+        """Return (version, {status: count, ..., "total": n})."""
+        with self.lock:
+            return self.version, self._counts()
+
+    def page(self, status=None, q="", cursor=None, limit=100):
+        """One page of the sorted view as (version, records, next_cursor).
+
+        status restricts to one status, q is a case-insensitive substring of
+        id or nickname, and cursor is the next_cursor of the previous page.
+        Cursors are sort keys, so pages stay consistent while records are
+        added or removed between requests.
+        """
+        q = (q or "").strip().lower()
+        with self.lock:
+            lo, hi = 0, len(self.keys)
+            if status:
+                priority = STATUS_PRIORITY[status]
+                lo = bisect.bisect_left(self.keys, (priority,))
+                hi = bisect.bisect_left(self.keys, (priority + 1,))
+            if cursor:
+                lo = max(lo, bisect.bisect_right(self.keys, decode_cursor(cursor)))
+
+            found = []
+            if len(q) >= 3:
+                # Intersect trigram postings, rarest first, then confirm the substring
+                postings = sorted((self.grams.get(g, set()) for g in trigrams(q)), key=len)
+                seqs = postings[0].intersection(*postings[1:])
+                lo_key = self.keys[lo] if lo < len(self.keys) else None
+                hi_key = self.keys[hi] if hi < len(self.keys) else None
+                for key in sorted(self.key_of_seq[seq] for seq in seqs):
+                    if lo_key is None or key < lo_key:
+                        continue
+                    if hi_key is not None and key >= hi_key:
+                        break
+                    creator = self.records[bisect.bisect_left(self.keys, key)]
+                    if matches(creator, q):
+                        found.append((key, creator))
+                        if len(found) > limit:
+                            break
+            else:
+                # Short or empty query: walk the range in order and stop at limit
+                for index in range(lo, hi):
+                    creator = self.records[index]
+                    if not q or matches(creator, q):
+                        found.append((self.keys[index], creator))
+                        if len(found) > limit:
+                            break
+
+            next_cursor = None
+            if len(found) > limit:
+                found = found[:limit]
+                next_cursor = encode_cursor(found[-1][0])
+            return self.version, [creator for _, creator in found], next_cursor
@@ -0,0 +1,66 @@
+import json
+import threading
+from collections import deque
+
+
+class EventHub:
+    """Fan-out of server events to Server-Sent Events streams.
+
+    Events get a monotonically increasing seq and are kept in a bounded
+    backlog. Each stream remembers the last seq it sent and asks for
+    everything after it; a stream that fell further behind than the backlog
+    gets None back and must resend a full snapshot instead.
+    """
+
+    def __init__(self, backlog=256):
+        self.cond = threading.Condition()
+        self.events = deque(maxlen=backlog)
+        self.seq = 0
+        self.subscribers = 0
+        self.closed = False
+
+    def publish(self, event, data):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self.cond:
+            self.seq += 1
+            self.events.append((self.seq, event, payload))
+            self.cond.notify_all()
+
+    def wait(self, after_seq, timeout):
+        """Block until there are events after after_seq or timeout expires.
+
+        Returns a list of (seq, event, payload), or None when events between
+        after_seq and the oldest backlog entry were already dropped.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after_seq or self.closed, timeout=timeout)
+            if self.seq <= after_seq:
+                return []
+            if self.events[0][0] > after_seq + 1:
+                return None
+            return [e for e in self.events if e[0] > after_seq]
+
+    def subscribe(self):
+        with self.cond:
+            self.subscribers += 1
+            return self.seq
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+
+    def close(self):
+        """Wake every waiting stream so it can exit."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+def format_event(event, payload, event_id=None):
+    """Encode one SSE message; payload is already-serialized JSON (str or bytes)."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    head = f"event: {event}\n"
+    if event_id is not None:
+        head = f"id: {event_id}\n" + head
+    return head.encode() + b"data: " + payload + b"\n\n"
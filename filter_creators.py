@@ -2,6 +2,8 @@ import time
 import os
 from playwright.sync_api import sync_playwright
 
+from browser_service import open_page_sync
+
 USER_DATA_DIR = "./tiktok_user_data"
 CREATOR_FILE = "active_streamers.txt"
 RESULTS_FILE = "agency_status_results.txt"
@@ -11,15 +13,13 @@ def interactive_checker():
     
     with sync_playwright() as p:
         print("Launching browser...")
-        browser = p.chromium.launch_persistent_context(
-            user_data_dir=USER_DATA_DIR,
-            executable_path=chrome_path,
-            headless=False,
-            args=["--no-first-run", "--disable-blink-features=AutomationControlled"],
-            viewport=None
-        )
-        
-        page = browser.pages[0] if browser.pages else browser.new_page()
+        page, close_page = open_page_sync(p, "https://live-backstage.tiktok.com/", {
+            "user_data_dir": USER_DATA_DIR,
+            "executable_path": chrome_path,
+            "headless": False,
+            "args": ["--no-first-run", "--disable-blink-features=AutomationControlled"],
+            "viewport": None
+        })
         page.goto("https://live-backstage.tiktok.com/", timeout=60000)
         
         print("\n" + "="*50)
@@ -127,7 +127,7 @@ def interactive_checker():
             print(f"Error during automation: {e}")
             page.screenshot(path="error_debug.png")
 
-        browser.close()
+        close_page()
 
 if __name__ == "__main__":
     interactive_checker()
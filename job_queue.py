@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+import uuid
+
+from storage import JOBS_FILE, write_json_atomic
+
+# Job kind -> concurrency slot; at most SLOT_LIMITS[slot] jobs per slot run at once
+JOB_KINDS = {"verify": "verify", "dm": "dm", "dm_batch": "dm", "crawl": "crawl"}
+SLOT_LIMITS = {"verify": 1, "dm": 1, "crawl": 1}
+# Finished jobs kept in JOBS_FILE
+JOB_HISTORY = 200
+FINISHED_STATES = ("done", "failed", "cancelled", "interrupted")
+
+
+class JobQueue:
+    """Persistent queue of verification, DM and crawl runs.
+
+    A job is a dict with an id, kind, params, priority and state:
+    queued -> running -> done | failed | cancelled. Queued jobs start by
+    priority (higher first), then in submission order, whenever their
+    kind's slot has room, so queued runs go back to back without another
+    click. The queue is saved to JOBS_FILE after every change and queued
+    jobs survive a restart. Jobs that were running when the server stopped
+    are marked interrupted instead of being started again, so a DM is
+    never sent twice.
+
+    launch(job) starts a job and returns its supervised process, or None
+    (after setting job["note"]) when there turns out to be nothing to do.
+    on_exit(process) must be called when a launched process exits. With
+    paused=True jobs are only queued until schedule() is first called
+    (e.g. once the services they need are up).
+    """
+
+    def __init__(self, launch, path=JOBS_FILE, log=print, paused=False):
+        self.launch = launch
+        self.path = path
+        self.log = log
+        self.paused = paused
+        self.lock = threading.Lock()
+        self.jobs = []
+        self.processes = {}  # job id -> running process
+        self.cancelling = set()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", [])
+        except (OSError, ValueError):
+            self.jobs = []
+        interrupted = 0
+        for job in self.jobs:
+            if job["state"] == "running":
+                job.update(state="interrupted", ended_at=now_ms(), note="Server stopped while running")
+                interrupted += 1
+        if interrupted:
+            self._save()
+
+    def _save(self):
+        finished = [j for j in self.jobs if j["state"] in FINISHED_STATES]
+        if len(finished) > JOB_HISTORY:
+            drop = {j["id"] for j in finished[:len(finished) - JOB_HISTORY]}
+            self.jobs = [j for j in self.jobs if j["id"] not in drop]
+        write_json_atomic(self.path, {"jobs": self.jobs}, indent=None)
+
+    def submit(self, kind, params=None, priority=0):
+        """Queue a job and start it if its slot is free; returns a copy of it."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "params": params or {},
+            "priority": int(priority),
+            "state": "queued",
+            "created_at": now_ms(),
+        }
+        with self.lock:
+            self.jobs.append(job)
+            self._schedule()
+            self._save()
+            return dict(job)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns (ok, message)."""
+        with self.lock:
+            job = self._find(job_id)
+            if job is None:
+                return False, "Job not found"
+            if job["state"] == "queued":
+                job.update(state="cancelled", ended_at=now_ms())
+                self._save()
+                return True, "Job cancelled"
+            if job["state"] == "running" and job_id in self.processes:
+                # on_exit records the final state once the process is gone
+                self.cancelling.add(job_id)
+                self.processes[job_id].terminate()
+                return True, "Job stopping"
+            return False, f"Job already {job['state']}"
+
+    def on_exit(self, process):
+        with self.lock:
+            job_id = next((i for i, p in self.processes.items() if p is process), None)
+            if job_id is None:
+                return
+            del self.processes[job_id]
+            job = self._find(job_id)
+            if job_id in self.cancelling:
+                self.cancelling.discard(job_id)
+                state = "cancelled"
+            else:
+                state = "done" if process.exit_code == 0 else "failed"
+            job.update(state=state, ended_at=now_ms(), exit_code=process.exit_code)
+            self.log(f"Job {job_id} ({job['kind']}) {state}")
+            self._schedule()
+            self._save()
+
+    def _schedule(self):
+        if self.paused:
+            return
+        busy = {}
+        for job_id in self.processes:
+            slot = JOB_KINDS[self._find(job_id)["kind"]]
+            busy[slot] = busy.get(slot, 0) + 1
+        queued = [j for j in self.jobs if j["state"] == "queued"]
+        # Stable sort keeps submission order within a priority
+        for job in sorted(queued, key=lambda j: -j["priority"]):
+            slot = JOB_KINDS[job["kind"]]
+            if busy.get(slot, 0) >= SLOT_LIMITS[slot]:
+                continue
+            job.update(state="running", started_at=now_ms())
+            try:
+                process = self.launch(job)
+            except Exception as e:
+                job.update(state="failed", ended_at=now_ms(), note=str(e))
+                self.log(f"Job {job['id']} ({job['kind']}) failed to start: {e}")
+                continue
+            if process is None:
+                job.update(state="done", ended_at=now_ms())
+                continue
+            job["pid"] = process.pid
+            self.processes[job["id"]] = process
+            busy[slot] = busy.get(slot, 0) + 1
+
+    def schedule(self):
+        """Start whatever queued jobs fit (e.g. after a restart); ends a pause."""
+        with self.lock:
+            self.paused = False
+            self._schedule()
+            self._save()
+
+    def _find(self, job_id):
+        return next((j for j in self.jobs if j["id"] == job_id), None)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self._find(job_id)
+            return dict(job) if job else None
+
+    def list(self, state=None):
+        """Jobs newest first, optionally only those in one state."""
+        with self.lock:
+            return [dict(j) for j in reversed(self.jobs) if state is None or j["state"] == state]
+
+    def queued_counts(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs:
+                if job["state"] == "queued":
+                    counts[job["kind"]] = counts.get(job["kind"], 0) + 1
+            return counts
+
+
+def now_ms():
+    return int(time.time() * 1000)
@@ -0,0 +1,141 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# First read of a log (no offset yet) starts this far from the end
+TAIL_BYTES = 4096
+# Most bytes returned by one read_new() call
+CHUNK_BYTES = 64 * 1024
+POLL_INTERVAL = 0.5
+
+
+def file_id(st):
+    """Identity of the file behind a path; changes when the log rotates."""
+    return f"{st.st_dev:x}-{st.st_ino:x}"
+
+
+def read_new(path, since=None, fid=None, limit=CHUNK_BYTES):
+    """Complete lines of path after byte offset since.
+
+    Returns {"offset", "id", "data", "reset"}. Pass the returned offset and
+    id back as since and fid to continue. Without since, or when the file
+    was rotated or truncated, reading restarts from the last TAIL_BYTES
+    and reset is True. Offsets always sit on line boundaries, so a reader
+    never gets a partial line or split character.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return {"offset": 0, "id": None, "data": "", "reset": bool(since)}
+    with f:
+        st = os.fstat(f.fileno())
+        current_id = file_id(st)
+        reset = since is None or (fid and fid != current_id) or since > st.st_size
+        start = max(st.st_size - TAIL_BYTES, 0) if reset else since
+        f.seek(start)
+        data = f.read(limit)
+        if reset and start > 0:
+            # Drop the partial first line of the tail window
+            first = data.find(b"\n") + 1
+            start += first
+            data = data[first:]
+        end = data.rfind(b"\n") + 1
+        if not end and len(data) == limit:
+            end = limit  # one line longer than a chunk: pass it on in pieces
+        return {
+            "offset": start + end,
+            "id": current_id,
+            "data": data[:end].decode("utf-8", "replace"),
+            "reset": bool(reset and since is not None),
+        }
+
+
+class LogWatcher:
+    """Blocks until one of a set of log files may have changed.
+
+    Uses inotify on the files' directories where available (Linux), so a
+    waiting stream costs nothing until a write lands; elsewhere it polls
+    the files' stat every POLL_INTERVAL seconds.
+    """
+
+    IN_MODIFY = 0x002
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self, paths):
+        self.names = {os.path.basename(p) for p in paths}
+        self.paths = list(paths)
+        self.fd = None
+        self.libc = None
+        if sys.platform.startswith("linux"):
+            self._init_inotify()
+        self.last = self._stats()
+
+    def _init_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK)
+            if fd < 0:
+                return
+            mask = self.IN_MODIFY | self.IN_MOVED_TO | self.IN_CREATE
+            for directory in {os.path.dirname(os.path.abspath(p)) for p in self.paths}:
+                if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                    os.close(fd)
+                    return
+        except (OSError, AttributeError):
+            return
+        self.libc = libc
+        self.fd = fd
+
+    def _stats(self):
+        stats = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stats.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                stats.append(None)
+        return stats
+
+    def _drain(self):
+        """Read pending inotify events; True if any concerns a watched file."""
+        hit = False
+        while True:
+            try:
+                buf = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return hit
+            offset = 0
+            while offset < len(buf):
+                _, _, _, length = struct.unpack_from("iIII", buf, offset)
+                name = buf[offset + 16:offset + 16 + length].rstrip(b"\0").decode("utf-8", "replace")
+                hit = hit or name in self.names
+                offset += 16 + length
+
+    def wait(self, timeout):
+        """Return True as soon as a watched file changes, False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], remaining)
+                if ready and self._drain():
+                    return True
+                continue
+            time.sleep(min(POLL_INTERVAL, remaining))
+            stats = self._stats()
+            if stats != self.last:
+                self.last = stats
+                return True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
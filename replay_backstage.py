@@ -0,0 +1,250 @@
+"""
+Offline replay of the Backstage Add Host flow (no login, no network).
+
+Serves backstage_full.html (scripts stripped) at the relation URL through
+page.route and adds a stand-in invite dialog with Backstage's selectors.
+The stand-in shows Add Host after --boot-ms and the textarea --dialog-ms
+after the click. Next posts the ids to the fixture's eligibility URL,
+answered with the fixture's recorded body after --api-ms, and the rows
+render --render-ms later, each delay with random jitter. Every round runs
+the old fixed-sleep sequence, the condition-driven table sequence and the
+eligibility-response sequence on the same page, checks each against the
+fixture's expected statuses, and prints per-step histograms and speedups.
+
+A fixture is {"url", "ids", "body", "expected": {id: status}}; files saved
+by verify_batch.py --record have url and body, add ids and expected.
+
+Usage:
+    python replay_backstage.py                  # 5 rounds on the sample fixture
+    python replay_backstage.py --rounds 10 --api-ms 1500
+    python replay_backstage.py --check-fixtures # parse fixtures only, no browser
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import sys
+
+from backstage_flow import (
+    ADD_HOST_BUTTON, INVITE_TEXTAREA, RESULT_TABLE, STATUSES, ResponseCapture, StepTimer, classify_text,
+    extract_rows, match_rows, open_invite_dialog, parse_eligibility, submit_ids, wait_for_backstage, wait_for_rows,
+)
+
+BACKSTAGE_URL = "https://live-backstage.tiktok.com/portal/anchor/relation"
+SAVED_PAGE = "backstage_full.html"
+FIXTURES_DIR = os.path.join("fixtures", "backstage")
+DEFAULT_FIXTURE = os.path.join(FIXTURES_DIR, "eligibility_sample.json")
+
+STAND_IN_SCRIPT = """
+<script>
+(() => {
+  const cfg = __CONFIG__;
+  const jitter = ms => ms * (1 + (Math.random() - 0.5) * cfg.jitter);
+
+  setTimeout(() => {
+    const add = document.createElement("button");
+    add.setAttribute("data-e2e-tag", "host_manageRelationship_addHostBtn");
+    add.textContent = "크리에이터 추가";
+    add.style.cssText = "position:fixed;top:10px;right:10px;z-index:10000";
+    add.onclick = () => setTimeout(openDialog, jitter(cfg.dialogMs));
+    document.body.appendChild(add);
+  }, jitter(cfg.bootMs));
+
+  function openDialog() {
+    const modal = document.createElement("div");
+    modal.className = "semi-modal";
+    modal.style.cssText = "position:fixed;top:60px;left:60px;right:60px;z-index:10001;background:#fff;padding:16px";
+    modal.innerHTML = '<div class="semi-modal-content">' +
+      '<textarea data-testid="inviteHostTextArea" rows="8" cols="40"></textarea>' +
+      '<button class="semi-button semi-button-primary" disabled>다음</button>' +
+      '<div class="results"></div></div>';
+    document.body.appendChild(modal);
+    const area = modal.querySelector("textarea");
+    const next = modal.querySelector("button");
+    area.addEventListener("input", () => { next.disabled = !area.value.trim(); });
+    next.onclick = async () => {
+      const ids = area.value.split("\\n").map(s => s.trim()).filter(Boolean);
+      const results = modal.querySelector(".results");
+      const response = await fetch(cfg.apiUrl, {method: "POST", body: JSON.stringify({ids})});
+      await response.json();
+      // Rows arrive in two renders, as the real table fills from paged data
+      const half = Math.ceil(ids.length / 2);
+      setTimeout(() => {
+        renderRows(results, ids.slice(0, half));
+        setTimeout(() => renderRows(results, ids), 150);
+      }, jitter(cfg.renderMs));
+    };
+  }
+
+  function renderRows(target, ids) {
+    const rows = ids.map(id =>
+      `<tr role="row"><td aria-colindex="1">${id}<br>${id} 닉네임</td>` +
+      `<td aria-colindex="2">${cfg.rowStatus[id] || "알 수 없음"}</td></tr>`).join("");
+    target.innerHTML = `<table><tbody class="semi-table-tbody">${rows}</tbody></table>`;
+  }
+})();
+</script>
+"""
+
+
+def load_fixture(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_fixtures(directory):
+    """Parse every fixture's body offline and compare with its expected statuses."""
+    failures = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        fixture = load_fixture(path)
+        if "expected" not in fixture:
+            print(f"skip {path} (no expected statuses)")
+            continue
+        got = parse_eligibility(fixture["body"], fixture["ids"])
+        wrong = {i: (got.get(i), s) for i, s in fixture["expected"].items() if got.get(i) != s}
+        failures += bool(wrong)
+        print(f"{'FAIL' if wrong else 'ok  '} {path}" + (f" (got, expected): {wrong}" if wrong else ""))
+    return failures
+
+
+def build_page(args, fixture):
+    with open(SAVED_PAGE, "r", encoding="utf-8") as f:
+        html = f.read()
+    # The saved SPA bundles can't load offline; keep markup and styles only
+    html = re.sub(r"<script\b[^>]*>.*?</script>", "", html, flags=re.S | re.I)
+    config = {
+        "bootMs": args.boot_ms,
+        "dialogMs": args.dialog_ms,
+        "renderMs": args.render_ms,
+        "jitter": args.jitter,
+        "apiUrl": fixture["url"],
+        # The table shows the same outcome as the response
+        "rowStatus": {i: STATUSES[s][0] for i, s in fixture["expected"].items()},
+    }
+    script = STAND_IN_SCRIPT.replace("__CONFIG__", json.dumps(config))
+    return html.replace("</body>", script + "</body>") if "</body>" in html else html + script
+
+
+async def table_statuses(page, ids):
+    return {uid: classify_text(" ".join(row["cells"][1:]) or row["text"])
+            for uid, row in match_rows(await extract_rows(page), ids).items()}
+
+
+async def fixed_sleep_flow(page, ids, timer):
+    """The sequence verify_batch used before backstage_flow (3 s / 2 s / 1 s / 4 s)."""
+    with timer.step("page_ready"):
+        await page.goto(BACKSTAGE_URL, wait_until="domcontentloaded")
+        await asyncio.sleep(3)
+        await page.wait_for_selector(ADD_HOST_BUTTON, timeout=300000)
+    with timer.step("open_dialog"):
+        await page.click(ADD_HOST_BUTTON)
+        await asyncio.sleep(2)
+        await page.wait_for_selector(INVITE_TEXTAREA, timeout=5000)
+    with timer.step("submit"):
+        await page.fill(INVITE_TEXTAREA, "\n".join(ids))
+        await asyncio.sleep(1)
+        for selector in ["button:has-text('다음')", "button:has-text('Next')", ".semi-modal-content button.semi-button-primary"]:
+            if await page.query_selector(selector):
+                await page.click(selector)
+                break
+    with timer.step("results"):
+        await asyncio.sleep(4)
+        await page.wait_for_selector(RESULT_TABLE, timeout=10000)
+    return await table_statuses(page, ids)
+
+
+async def table_flow(page, ids, timer):
+    await page.goto(BACKSTAGE_URL, wait_until="domcontentloaded")
+    await wait_for_backstage(page, timer)
+    await open_invite_dialog(page, timer)
+    await submit_ids(page, ids, timer)
+    await wait_for_rows(page, ids, timer)
+    return await table_statuses(page, ids)
+
+
+async def response_flow(page, ids, timer):
+    capture = ResponseCapture(page)
+    try:
+        await page.goto(BACKSTAGE_URL, wait_until="domcontentloaded")
+        await wait_for_backstage(page, timer)
+        await open_invite_dialog(page, timer)
+        await submit_ids(page, ids, timer)
+        return await capture.wait(ids, timer)
+    finally:
+        capture.close()
+
+
+async def run(args):
+    from playwright.async_api import async_playwright
+
+    fixture = load_fixture(args.fixture)
+    body = build_page(args, fixture)
+    ids = fixture["ids"]
+    flows = {"fixed sleeps": fixed_sleep_flow, "conditions": table_flow, "response": response_flow}
+    timers = {name: StepTimer() for name in flows}
+    totals = {name: [] for name in flows}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not args.headed)
+        page = await browser.new_page()
+
+        async def serve(route):
+            url = route.request.url
+            if url.startswith(BACKSTAGE_URL):
+                await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=body)
+            elif url.split("?")[0] == fixture["url"].split("?")[0]:
+                await asyncio.sleep(args.api_ms * (1 + (random.random() - 0.5) * args.jitter) / 1000)
+                await route.fulfill(status=200, content_type="application/json", body=json.dumps(fixture["body"]))
+            else:
+                await route.abort()
+
+        await page.route("**/*", serve)
+
+        for round_number in range(1, args.rounds + 1):
+            for name, flow in flows.items():
+                timer = StepTimer()
+                statuses = await flow(page, ids, timer)
+                if statuses != fixture["expected"]:
+                    wrong = {i: (statuses.get(i), s) for i, s in fixture["expected"].items() if statuses.get(i) != s}
+                    raise RuntimeError(f"{name}: statuses differ from the fixture (got, expected): {wrong}")
+                for step, values in timer.samples.items():
+                    for ms in values:
+                        timers[name].add(step, ms)
+                totals[name].append(timer.total())
+            print(f"round {round_number}: " + ", ".join(f"{n} {totals[n][-1]:.0f} ms" for n in flows))
+
+        await browser.close()
+
+    for name, timer in timers.items():
+        print(f"\n{name} (per step)\n{timer.report()}")
+    before = statistics.mean(totals["fixed sleeps"])
+    print(f"\nPer {len(ids)}-id batch, fixed sleeps {before:.0f} ms:")
+    for name in ("conditions", "response"):
+        after = statistics.mean(totals[name])
+        print(f"  {name:<11} {after:>6.0f} ms ({before - after:.0f} ms saved, {before / after:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="Eligibility response fixture")
+    parser.add_argument("--boot-ms", type=int, default=800, help="Page load until Add Host shows")
+    parser.add_argument("--dialog-ms", type=int, default=300, help="Add Host click until the textarea shows")
+    parser.add_argument("--api-ms", type=int, default=1200, help="Next click until the eligibility response")
+    parser.add_argument("--render-ms", type=int, default=300, help="Eligibility response until the rows render")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Relative random spread of the delays")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--check-fixtures", nargs="?", const=FIXTURES_DIR, metavar="DIR",
+                        help="Only parse the fixtures in DIR against their expected statuses")
+    args = parser.parse_args()
+    if args.check_fixtures:
+        sys.exit(1 if check_fixtures(args.check_fixtures) else 0)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
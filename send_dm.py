@@ -1,16 +1,18 @@
 import asyncio
 import sys
 import os
-import json
 import time
 import pyperclip
 from datetime import datetime
 from playwright.async_api import async_playwright
 
+from app_logging import get_log
+from browser_service import open_page
+from storage import get_store
+
 # Configuration
 USER_DATA_DIR = "./tiktok_user_data"
 CHROME_PATH = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-DM_STATUS_FILE = "dm_status.json"
 BACKSTAGE_DM_URL = "https://live-backstage.tiktok.com/portal/anchor/instant-messages"
 LOG_FILE = "dm.log"
 
@@ -43,30 +45,7 @@ If interested, feel free to reply!
 Official website: https://www.arthrian.cloud/"""
 
 
-def load_dm_status():
-    if os.path.exists(DM_STATUS_FILE):
-        try:
-            with open(DM_STATUS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return {"sent": [], "failed": []}
-
-
-def save_dm_status(data):
-    with open(DM_STATUS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-def log(msg):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line)
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except:
-        pass
+log = get_log(LOG_FILE)
 
 
 def _find_chrome_executable():
@@ -134,16 +113,16 @@ async def send_dm(handle, nickname="", lang="kr", auto_send=True):
             launch_args["channel"] = "chrome"
             log("Using Playwright Chrome channel")
 
-        context = None
+        close_page = None
         try:
-            context = await p.chromium.launch_persistent_context(**launch_args)
-            page = context.pages[0] if context.pages else await context.new_page()
+            page, close_page = await open_page(p, BACKSTAGE_DM_URL, launch_args, log)
             page.set_default_timeout(15000)
 
-            # Navigate to Backstage DM page
-            log(f"Navigating to Backstage DM page...")
-            await page.goto(BACKSTAGE_DM_URL, wait_until="domcontentloaded")
-            await asyncio.sleep(3)
+            # Navigate to Backstage DM page (a warm page is already there)
+            if not page.url.startswith(BACKSTAGE_DM_URL):
+                log(f"Navigating to Backstage DM page...")
+                await page.goto(BACKSTAGE_DM_URL, wait_until="domcontentloaded")
+                await asyncio.sleep(3)
 
             # Check login
             if "login" in page.url.lower():
@@ -278,14 +257,12 @@ async def send_dm(handle, nickname="", lang="kr", auto_send=True):
                 await asyncio.sleep(2)
 
                 # Update status
-                dm_status = load_dm_status()
-                dm_status["sent"].append({
+                get_store().record_dm("sent", {
                     "id": handle,
                     "nickname": nickname,
                     "lang": lang,
                     "sent_at": int(datetime.now().timestamp() * 1000)
                 })
-                save_dm_status(dm_status)
 
                 log(f"DM sent to @{handle}!")
                 result = {"status": "success", "message": f"DM sent to @{handle}"}
@@ -301,19 +278,17 @@ async def send_dm(handle, nickname="", lang="kr", auto_send=True):
             result = {"status": "error", "message": str(e)}
 
             # Record failure
-            dm_status = load_dm_status()
-            dm_status["failed"].append({
+            get_store().record_dm("failed", {
                 "id": handle,
                 "nickname": nickname,
                 "error": str(e),
                 "failed_at": int(datetime.now().timestamp() * 1000)
             })
-            save_dm_status(dm_status)
 
         finally:
-            if context:
+            if close_page:
                 await asyncio.sleep(1)
-                await context.close()
+                await close_page()
 
     return result
 
@@ -357,16 +332,16 @@ async def send_dm_batch(creators, lang="kr", delay=3):
             launch_args["channel"] = "chrome"
             log("Using Playwright Chrome channel")
 
-        context = None
+        close_page = None
         try:
-            context = await p.chromium.launch_persistent_context(**launch_args)
-            page = context.pages[0] if context.pages else await context.new_page()
+            page, close_page = await open_page(p, BACKSTAGE_DM_URL, launch_args, log)
             page.set_default_timeout(15000)
 
-            # Navigate to Backstage DM page
-            log("Navigating to Backstage DM page...")
-            await page.goto(BACKSTAGE_DM_URL, wait_until="domcontentloaded")
-            await asyncio.sleep(2)
+            # Navigate to Backstage DM page (a warm page is already there)
+            if not page.url.startswith(BACKSTAGE_DM_URL):
+                log("Navigating to Backstage DM page...")
+                await page.goto(BACKSTAGE_DM_URL, wait_until="domcontentloaded")
+                await asyncio.sleep(2)
 
             # Check login
             if "login" in page.url.lower():
@@ -441,14 +416,12 @@ async def send_dm_batch(creators, lang="kr", delay=3):
                     await asyncio.sleep(1.5)
 
                     # Record success
-                    dm_status = load_dm_status()
-                    dm_status["sent"].append({
+                    get_store().record_dm("sent", {
                         "id": handle,
                         "nickname": nickname,
                         "lang": lang,
                         "sent_at": int(datetime.now().timestamp() * 1000)
                     })
-                    save_dm_status(dm_status)
 
                     results["success"].append(handle)
                     log(f"  OK DM sent to @{handle}")
@@ -457,14 +430,12 @@ async def send_dm_batch(creators, lang="kr", delay=3):
                     log(f"  NO Failed: {e}")
                     results["failed"].append({"id": handle, "error": str(e)})
 
-                    dm_status = load_dm_status()
-                    dm_status["failed"].append({
+                    get_store().record_dm("failed", {
                         "id": handle,
                         "nickname": nickname,
                         "error": str(e),
                         "failed_at": int(datetime.now().timestamp() * 1000)
                     })
-                    save_dm_status(dm_status)
 
                 # Wait before next DM
                 if i < len(creators) - 1:
@@ -475,9 +446,9 @@ async def send_dm_batch(creators, lang="kr", delay=3):
             log(f"Batch error: {e}")
 
         finally:
-            if context:
+            if close_page:
                 await asyncio.sleep(1)
-                await context.close()
+                await close_page()
 
     log(f"\nBatch complete: {len(results['success'])} sent, {len(results['failed'])} failed")
     return results
@@ -1,5 +1,6 @@
+import gzip
+import hashlib
 import http.server
-import socketserver
 import json
 import subprocess
 import sys
@@ -8,58 +9,490 @@ import threading
 import time
 import uuid
 import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import get_log
+from browser_service import wait_until_listening
+from creator_view import STATUS_PRIORITY, CreatorView
+from event_hub import EventHub, format_event
+from job_queue import JOB_KINDS, JobQueue
+from log_tail import LogWatcher, read_new
+from storage import (
+    CLIPPER_STATUS_FILE, VERIFY_CHECKPOINT_FILE, SeenIndex, get_store, known_handles, write_json_atomic,
+)
+from supervisor import Supervisor
 
 PORT = 8091
-PENDING_FILE = "pending_creators.json"
-VERIFIED_FILE = "verified_creators.json"
-DM_STATUS_FILE = "dm_status.json"
 LOG_FILE = "server.log"
+# Component logs served by /logs and /logs/stream
+LOG_FILES = {
+    "server": LOG_FILE,
+    "clipper": "clipper.log",
+    "verify": "verify.log",
+    "dm": "dm.log",
+    "browser": "browser.log",
+}
 PYTHON_EXE = sys.executable
+# Concurrency: each connection is served by a pooled worker thread.
+# Browsers open at most 6 connections per host, so 64 leaves plenty of room.
+MAX_WORKERS = 64
+KEEPALIVE_TIMEOUT = 5
 
 VERIFY_PROCESS = None
 CLIPPER_PROCESS = None
 DM_PROCESS = None
+# Shared warm Chrome for the Backstage workers (browser_service.py); opt in with 1,
+# since it keeps a Chrome with remote debugging (CDP) open as long as the server runs
+USE_BROWSER_SERVICE = os.environ.get("TIKTOK_BROWSER_SERVICE", "0") == "1"
+BROWSER_PROCESS = None
+# Jobs wait this long at startup for the browser service to take the profile
+BROWSER_SERVICE_STARTUP = 20
+PROCESS_LOCK = threading.Lock()
+# Version counters restart with the process; keep old ETags from matching
+BOOT_ID = uuid.uuid4().hex[:8]
+GZIP_MIN_SIZE = 1024
+GZIP_CACHE_SIZE = 16
+# Server-Sent Events: streams each hold a pool worker, so cap them below MAX_WORKERS
+MAX_EVENT_STREAMS = 32
+EVENT_KEEPALIVE = 15
+WATCH_INTERVAL = 0.5
+# /creators pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Journal backend: how often to check whether the journal needs compacting
+COMPACT_INTERVAL = 60
 
+log = get_log(LOG_FILE)
 
-def log(msg):
-    timestamp = time.strftime("%H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
 
+class DataCache:
+    """Loaded storage collections shared by all request threads.
 
-def load_json(filepath, default=None):
-    if default is None:
-        default = []
-    if os.path.exists(filepath):
+    Entries are keyed on collection name and validated against the store's
+    change signature (file mtime/size, or the SQLite WAL stat) on every
+    lookup, so data is only reloaded after someone has written it.
+    Returned objects are shared: callers must not mutate them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.counter = 0
+
+    def get(self, name):
+        return self.get_versioned(name)[1]
+
+    def get_versioned(self, name):
+        """Return (version, data); version changes whenever the data is reloaded."""
+        signature = STORE.signature(name)
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and entry[0] == signature:
+                self.hits += 1
+                return entry[2], entry[1]
+
+        # Key on the signature of what was actually read, not the earlier check
+        signature, data = STORE.snapshot(name)
+        with self.lock:
+            self.misses += 1
+            self.counter += 1
+            self.entries[name] = (signature, data, self.counter)
+            return self.counter, data
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0,
+                "collections": sorted(self.entries),
+            }
+
+
+STORE = get_store()
+DATA_CACHE = DataCache()
+
+
+def load_data(name):
+    return DATA_CACHE.get(name)
+
+
+def make_etag(*parts):
+    """Strong ETag from data version counters, scoped to this server run."""
+    return '"' + "-".join([BOOT_ID] + [str(p) for p in parts]) + '"'
+
+
+HUB = EventHub()
+EVENT_SLOTS = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+# Set by request handlers to make the watcher look for changes right away
+STATE_CHANGED = threading.Event()
+
+
+def on_process_exit(process):
+    JOBS.on_exit(process)
+    STATE_CHANGED.set()
+
+
+# Children's output is drained into per-run tails; exits advance the job queue
+SUPERVISOR = Supervisor(log, on_exit=on_process_exit)
+
+
+def publish_creator_delta(version, upserts, removed, counts):
+    HUB.publish("creators", {"version": version, "upserts": upserts, "removed": removed, "counts": counts})
+
+
+CREATOR_VIEW = CreatorView(on_change=publish_creator_delta)
+
+
+def sync_creator_view():
+    CREATOR_VIEW.sync(load_data("pending"), load_data("verified"))
+
+
+def is_running(process):
+    return bool(process and process.poll() is None)
+
+
+def child_status(process, path):
+    """Status file a running child writes (tagged with its pid), or None."""
+    if not is_running(process):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Ignore a file left behind by an earlier run
+    return status if status.get("pid") == process.pid else None
+
+
+def clipper_progress():
+    """Batch state the running clipper writes to CLIPPER_STATUS_FILE, or None."""
+    return child_status(CLIPPER_PROCESS, CLIPPER_STATUS_FILE)
+
+
+def verify_progress():
+    """Chunk counts from the running verification's checkpoint, or None."""
+    checkpoint = child_status(VERIFY_PROCESS, VERIFY_CHECKPOINT_FILE)
+    if checkpoint:
+        checkpoint.pop("done", None)
+    return checkpoint
+
+
+def process_status():
+    dm_data = load_data("dm_status")
+    return {
+        "browser": is_running(BROWSER_PROCESS),
+        "clipper": is_running(CLIPPER_PROCESS),
+        "clipper_progress": clipper_progress(),
+        "verify": is_running(VERIFY_PROCESS),
+        "verify_progress": verify_progress(),
+        "dm": is_running(DM_PROCESS),
+        "queued": JOBS.queued_counts(),
+        "sent": [s.get("id") for s in dm_data.get("sent", [])],
+    }
+
+
+def watch_state():
+    """Publish creator deltas and process-state changes while anyone listens."""
+    last_status = None
+    while not HUB.closed:
+        STATE_CHANGED.wait(WATCH_INTERVAL)
+        STATE_CHANGED.clear()
+        if not HUB.subscribers:
+            last_status = None
+            continue
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return default
+            sync_creator_view()
+            status = process_status()
+            if status != last_status:
+                HUB.publish("status", status)
+                last_status = status
+        except Exception as e:
+            log(f"Watcher error: {e}")
+
+
+def launch_job(job):
+    """Start a queued job's process; None (with a note) if there is nothing to do."""
+    global VERIFY_PROCESS, DM_PROCESS
+    kind, params = job["kind"], job["params"]
+
+    if kind == "verify":
+        pending = load_data("pending")
+        if not pending:
+            job["note"] = "No pending creators"
+            return None
+        log(f"Starting verification for {len(pending)} creators...")
+        VERIFY_PROCESS = SUPERVISOR.start("verify", [PYTHON_EXE, "verify_batch.py"])
+        return VERIFY_PROCESS
+
+    if kind == "dm":
+        handle = params["id"]
+        log(f"Sending DM to @{handle}...")
+        DM_PROCESS = SUPERVISOR.start(
+            "dm", [PYTHON_EXE, "send_dm.py", handle, params.get("nickname", ""), params.get("lang", "kr")]
+        )
+        return DM_PROCESS
+
+    if kind == "dm_batch":
+        # Worked out at launch, so creators DMed by an earlier job are skipped
+        to_dm = creators_to_dm()
+        if not to_dm:
+            job["note"] = "No creators to DM"
+            return None
+        log(f"Starting batch DM to {len(to_dm)} creators...")
+        # Write batch file for the DM script
+        write_json_atomic("dm_batch.json", {"creators": to_dm, "lang": params.get("lang", "kr")}, indent=None)
+        DM_PROCESS = SUPERVISOR.start("dm", [PYTHON_EXE, "send_dm_batch.py"])
+        return DM_PROCESS
+
+    if kind == "crawl":
+        log("Starting crawler...")
+        return SUPERVISOR.start("crawl", [PYTHON_EXE, "crawler.py"])
+
+
+def creators_to_dm():
+    """Available creators that haven't been DMed yet."""
+    verified = load_data("verified")
+    dm_status = load_data("dm_status")
+    available = verified.get("available", []) or verified.get("available_creators", [])
+    sent_ids = set(s.get("id") for s in dm_status.get("sent", []))
+    return [c for c in available if c.get("id") not in sent_ids]
+
+
+# Verify, DM and crawl runs; queued jobs survive restarts in jobs.json
+# Paused until start_jobs() has waited for the browser service
+JOBS = JobQueue(launch_job, log=log, paused=True)
+
+
+def start_jobs():
+    """Wait for the browser service, then start queued jobs (also those from before a restart)."""
+    if BROWSER_PROCESS and not wait_until_listening(BROWSER_SERVICE_STARTUP, BROWSER_PROCESS):
+        log("Browser service not listening; workers will launch their own browser")
+    JOBS.schedule()
+    STATE_CHANGED.set()
+
+
+def forget_deleted(ids):
+    """Drop deleted creators from the clipper's dedup index once the store no longer has them."""
+    known = known_handles(STORE)
+    gone = [i for i in ids if i and i.lower() not in known]
+    if gone:
+        SeenIndex().forget(gone)
+
+
+def compact_journal():
+    """Fold the creator journal into a fresh snapshot once it grows large."""
+    while not HUB.closed:
+        time.sleep(COMPACT_INTERVAL)
+        try:
+            if STORE.needs_compaction():
+                folded = STORE.compact()
+                log(f"Compacted {folded} journal bytes")
+        except Exception as e:
+            log(f"Compaction error: {e}")
+
+
+GZIP_CACHE = OrderedDict()
+GZIP_LOCK = threading.Lock()
 
 
-def save_json(filepath, data):
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def gzip_body(body, etag=None):
+    """Gzip a response body; bodies with an ETag are compressed once and reused."""
+    if not etag:
+        return gzip.compress(body, compresslevel=5)
+    with GZIP_LOCK:
+        cached = GZIP_CACHE.get(etag)
+        if cached is not None:
+            GZIP_CACHE.move_to_end(etag)
+            return cached
+    compressed = gzip.compress(body, compresslevel=5)
+    with GZIP_LOCK:
+        GZIP_CACHE[etag] = compressed
+        while len(GZIP_CACHE) > GZIP_CACHE_SIZE:
+            GZIP_CACHE.popitem(last=False)
+    return compressed
+
+
+class PooledHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP server that hands each connection to a bounded worker pool.
+
+    Keep-alive connections hold their worker until the client goes idle for
+    KEEPALIVE_TIMEOUT seconds, so the pool size caps open connections too.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, max_workers=MAX_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        HUB.close()
+        self.pool.shutdown(wait=False)
 
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def read_body(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        if content_length <= 0:
+            return ""
+        return self.rfile.read(content_length).decode("utf-8")
+
+    def etag_matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if not etag or not header:
+            return False
+        return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+    def send_body(self, body, content_type, status=200, etag=None):
+        if etag and self.etag_matches(etag):
+            self.send_not_modified(etag)
+            return
+
+        encoding = None
+        if len(body) >= GZIP_MIN_SIZE and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip_body(body, etag)
+            encoding = "gzip"
 
-    def send_json(self, data, status=200):
         self.send_response(status)
-        self.send_header("Content-type", "application/json")
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(body)))
         self.send_header("Access-Control-Allow-Origin", "*")
+        if etag:
+            self.send_header("ETag", etag)
+            # Cache, but revalidate every poll so the 304 path is taken
+            self.send_header("Cache-Control", "no-cache")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode())
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200, etag=None):
+        if etag and self.etag_matches(etag):
+            self.send_not_modified(etag)
+            return
+        self.send_body(json.dumps(data, ensure_ascii=False).encode(), "application/json", status, etag)
+
+    def send_job(self, job, started_message):
+        """Reply to a job submission: started, queued behind others, or finished at once."""
+        if job["state"] == "running":
+            self.send_json({"status": "success", "message": started_message, "job": job})
+        elif job["state"] == "queued":
+            self.send_json({"status": "success", "message": f"Queued as job {job['id']}", "job": job})
+        else:
+            self.send_json({"status": "error", "message": job.get("note") or f"Job {job['state']}", "job": job})
+
+    def send_snapshot(self):
+        # Only version and counts: the dashboard pages through /creators itself
+        sync_creator_view()
+        version, counts = CREATOR_VIEW.versioned_counts()
+        payload = json.dumps({"version": version, "counts": counts})
+        self.wfile.write(format_event("snapshot", payload))
+        self.wfile.write(format_event("status", json.dumps(process_status(), ensure_ascii=False)))
+
+    def stream_events(self):
+        if not EVENT_SLOTS.acquire(blocking=False):
+            # The dashboard falls back to polling when the stream is refused
+            self.send_json({"status": "error", "message": "Too many event streams"}, status=503)
+            return
+
+        last_seq = HUB.subscribe()
+        STATE_CHANGED.set()
+        try:
+            self.send_response(200)
+            self.send_header("Content-type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.close_connection = True
+
+            self.wfile.write(b"retry: 3000\n\n")
+            self.send_snapshot()
+            while not HUB.closed:
+                events = HUB.wait(last_seq, EVENT_KEEPALIVE)
+                if events is None:
+                    # Fell behind the backlog: resync from a fresh snapshot
+                    last_seq = HUB.seq
+                    self.send_snapshot()
+                elif not events:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    for seq, event, payload in events:
+                        self.wfile.write(format_event(event, payload, seq))
+                    last_seq = events[-1][0]
+        except OSError:
+            pass
+        finally:
+            HUB.unsubscribe()
+            EVENT_SLOTS.release()
+
+    def stream_logs(self, names):
+        """Follow component logs as SSE "log" events of new complete lines."""
+        if not EVENT_SLOTS.acquire(blocking=False):
+            self.send_json({"status": "error", "message": "Too many event streams"}, status=503)
+            return
+
+        paths = {name: LOG_FILES[name] for name in names}
+        watcher = LogWatcher(paths.values())
+        cursors = {name: (None, None) for name in paths}
+        try:
+            self.send_response(200)
+            self.send_header("Content-type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.close_connection = True
+
+            self.wfile.write(b"retry: 3000\n\n")
+            changed = True
+            while not HUB.closed:
+                if not changed:
+                    if not watcher.wait(EVENT_KEEPALIVE):
+                        self.wfile.write(b": keepalive\n\n")
+                        continue
+                changed = False
+                for name, path in paths.items():
+                    since, fid = cursors[name]
+                    chunk = read_new(path, since, fid)
+                    cursors[name] = (chunk["offset"], chunk["id"])
+                    if chunk["data"] or chunk["reset"]:
+                        # Read again right away in case more than one chunk was waiting
+                        changed = changed or chunk["offset"] != since
+                        payload = json.dumps({"name": name, **chunk}, ensure_ascii=False)
+                        self.wfile.write(format_event("log", payload))
+        except OSError:
+            pass
+        finally:
+            watcher.close()
+            EVENT_SLOTS.release()
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, DELETE, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
     def do_GET(self):
@@ -68,165 +501,179 @@ class Handler(http.server.SimpleHTTPRequestHandler):
 
         # Get pending creators
         if path == "/pending":
-            data = load_json(PENDING_FILE, [])
-            self.send_json({"creators": data})
+            version, data = DATA_CACHE.get_versioned("pending")
+            self.send_json({"creators": data}, etag=make_etag("pending", version))
 
         # Get verified creators
         elif path == "/verified":
-            data = load_json(VERIFIED_FILE, {"available": [], "unavailable": []})
-            self.send_json(data)
+            version, data = DATA_CACHE.get_versioned("verified")
+            self.send_json(data, etag=make_etag("verified", version))
 
-        # Get all creators (combined view)
+        # Get all creators (combined view), optionally paged/filtered
         elif path == "/creators":
-            pending = load_json(PENDING_FILE, [])
-            verified = load_json(VERIFIED_FILE, {"available": [], "unavailable": []})
-
-            all_creators = []
-
-            # Add pending
-            for c in pending:
-                creator = {
-                    "id": c["id"],
-                    "status": "pending",
-                    "added_at": c.get("added_at", 0)
-                }
-                if c.get("nickname"):
-                    creator["nickname"] = c["nickname"]
-                all_creators.append(creator)
-
-            # Add verified (available) - support both formats
-            available_list = verified.get("available", []) or verified.get("available_creators", [])
-            for c in available_list:
-                creator = {
-                    "id": c["id"],
-                    "status": "available",
-                    "reason": c.get("reason", "사용 가능"),
-                    "verified_at": c.get("verified_at", 0)
-                }
-                if c.get("nickname"):
-                    creator["nickname"] = c["nickname"]
-                all_creators.append(creator)
-
-            # Add verified (unavailable) - support both formats
-            unavailable_list = verified.get("unavailable", []) or verified.get("unavailable_creators", [])
-            for c in unavailable_list:
-                creator = {
-                    "id": c["id"],
-                    "status": "unavailable",
-                    "reason": c.get("reason", ""),
-                    "verified_at": c.get("verified_at", 0)
-                }
-                if c.get("nickname"):
-                    creator["nickname"] = c["nickname"]
-                all_creators.append(creator)
-
-            # Sort: available first, then by time (newest first)
-            def get_sort_key(x):
-                # Priority: available=0, pending=1, unavailable=2
-                status_priority = {"available": 0, "pending": 1, "unavailable": 2}
-                priority = status_priority.get(x.get("status"), 1)
-
-                # Time value
-                val = x.get("added_at") or x.get("verified_at") or 0
-                if isinstance(val, str):
-                    val = 0
-
-                return (priority, -val)  # Sort by priority first, then newest
-            all_creators.sort(key=get_sort_key)
-
-            self.send_json({"creators": all_creators})
+            sync_creator_view()
+            query = urllib.parse.parse_qs(parsed.query)
+            if not query:
+                version, body = CREATOR_VIEW.versioned_body()
+                self.send_body(body, "application/json", etag=make_etag("creators", version))
+                return
+
+            status = query.get("status", [""])[0]
+            if status and status not in STATUS_PRIORITY:
+                self.send_json({"status": "error", "message": f"Unknown status: {status}"}, status=400)
+                return
+            q = query.get("q", [""])[0]
+            cursor = query.get("cursor", [""])[0]
+            try:
+                limit = min(max(int(query.get("limit", [DEFAULT_PAGE_SIZE])[0]), 1), MAX_PAGE_SIZE)
+                version, creators, next_cursor = CREATOR_VIEW.page(status=status, q=q, cursor=cursor, limit=limit)
+            except ValueError:
+                self.send_json({"status": "error", "message": "Invalid limit or cursor"}, status=400)
+                return
+            # Each page/filter is its own representation (304s and GZIP_CACHE key on the ETag)
+            page_key = hashlib.sha1(json.dumps([status, q, cursor, limit]).encode()).hexdigest()[:12]
+            self.send_json({
+                "creators": creators,
+                "next_cursor": next_cursor,
+                "version": version
+            }, etag=make_etag("creators", version, page_key))
+
+        # Per-status creator counts
+        elif path == "/creators/counts":
+            sync_creator_view()
+            version, counts = CREATOR_VIEW.versioned_counts()
+            self.send_json(counts, etag=make_etag("counts", version))
+
+        # Live updates (creator deltas + process state)
+        elif path == "/events":
+            self.stream_events()
 
         # Clipper status
         elif path == "/clipper/status":
-            running = CLIPPER_PROCESS and CLIPPER_PROCESS.poll() is None
-            self.send_json({"running": running})
+            running = is_running(CLIPPER_PROCESS)
+            self.send_json({"running": running, "progress": clipper_progress()})
 
         # Verify status
         elif path == "/verify/status":
-            running = VERIFY_PROCESS and VERIFY_PROCESS.poll() is None
-            self.send_json({"running": running})
+            running = is_running(VERIFY_PROCESS)
+            self.send_json({"running": running, "progress": verify_progress()})
 
         # DM status
         elif path == "/dm/status":
-            dm_data = load_json(DM_STATUS_FILE, {"sent": [], "failed": []})
-            running = DM_PROCESS and DM_PROCESS.poll() is None
+            version, dm_data = DATA_CACHE.get_versioned("dm_status")
+            running = is_running(DM_PROCESS)
             self.send_json({
                 "running": running,
                 "sent": dm_data.get("sent", []),
                 "failed": dm_data.get("failed", [])
-            })
+            }, etag=make_etag("dm", version, int(bool(running))))
+
+        # Child process runs: exit code, duration and output tail (?name=verify&tail=50)
+        elif path == "/processes":
+            query = urllib.parse.parse_qs(parsed.query)
+            try:
+                tail = int(query.get("tail", [20])[0])
+            except ValueError:
+                self.send_json({"status": "error", "message": "Invalid tail"}, status=400)
+                return
+            name = query.get("name", [None])[0]
+            self.send_json({"processes": SUPERVISOR.jobs(name, max(tail, 0))})
+
+        # Job queue, newest first (?state=queued)
+        elif path == "/jobs":
+            query = urllib.parse.parse_qs(parsed.query)
+            self.send_json({"jobs": JOBS.list(query.get("state", [None])[0])})
+
+        elif path.startswith("/jobs/"):
+            job = JOBS.get(path[len("/jobs/"):])
+            if job is None:
+                self.send_json({"status": "error", "message": "Job not found"}, status=404)
+                return
+            self.send_json(job)
 
-        # Logs
+        # Server stats
+        elif path == "/stats":
+            self.send_json({"cache": DATA_CACHE.stats()})
+
+        # Logs: plain tail of server.log, or ?name=&since=&id= for new lines only
         elif path == "/logs":
-            self.send_response(200)
-            self.send_header("Content-type", "text/plain; charset=utf-8")
-            self.end_headers()
-            content = ""
-            if os.path.exists(LOG_FILE):
-                try:
-                    with open(LOG_FILE, "r", encoding="utf-8") as f:
-                        f.seek(0, os.SEEK_END)
-                        size = f.tell()
-                        f.seek(max(size - 4096, 0))
-                        content = f.read()
-                except:
-                    content = "Error reading logs"
-            self.wfile.write(content.encode())
+            query = urllib.parse.parse_qs(parsed.query)
+            if not query:
+                self.send_body(read_new(LOG_FILE)["data"].encode(), "text/plain; charset=utf-8")
+                return
+            name = query.get("name", ["server"])[0]
+            if name not in LOG_FILES:
+                self.send_json({"status": "error", "message": f"Unknown log: {name}"}, status=400)
+                return
+            try:
+                since = int(query["since"][0]) if "since" in query else None
+            except ValueError:
+                self.send_json({"status": "error", "message": "Invalid since"}, status=400)
+                return
+            chunk = read_new(LOG_FILES[name], since, query.get("id", [None])[0])
+            self.send_json({"name": name, **chunk})
+
+        # Live log tail (?name=server,verify; all component logs by default)
+        elif path == "/logs/stream":
+            query = urllib.parse.parse_qs(parsed.query)
+            names = [n for n in query.get("name", [",".join(LOG_FILES)])[0].split(",") if n]
+            unknown = [n for n in names if n not in LOG_FILES]
+            if unknown or not names:
+                self.send_json({"status": "error", "message": f"Unknown log: {','.join(unknown)}"}, status=400)
+                return
+            self.stream_logs(names)
 
         else:
             super().do_GET()
 
     def do_POST(self):
-        global CLIPPER_PROCESS, VERIFY_PROCESS, DM_PROCESS
-
         parsed = urllib.parse.urlparse(self.path)
         path = parsed.path
+        # Always consume the body so the keep-alive connection stays in sync
+        body = self.read_body()
+
+        # Process start/stop is check-then-act; serialize it across workers
+        with PROCESS_LOCK:
+            self.handle_post(path, body)
+        STATE_CHANGED.set()
+
+    def handle_post(self, path, body):
+        global CLIPPER_PROCESS
 
         # Start clipper
         if path == "/clipper/start":
-            if CLIPPER_PROCESS and CLIPPER_PROCESS.poll() is None:
+            if is_running(CLIPPER_PROCESS):
                 self.send_json({"status": "error", "message": "Already running"})
                 return
 
             log("Starting clipper bot...")
-            CLIPPER_PROCESS = subprocess.Popen(
-                [PYTHON_EXE, "clipper_bot.py"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
-            )
+            CLIPPER_PROCESS = SUPERVISOR.start("clipper", [PYTHON_EXE, "clipper_bot.py"])
             self.send_json({"status": "success", "message": "Clipper started"})
 
         # Stop clipper
         elif path == "/clipper/stop":
-            if CLIPPER_PROCESS and CLIPPER_PROCESS.poll() is None:
+            if is_running(CLIPPER_PROCESS):
                 CLIPPER_PROCESS.terminate()
                 CLIPPER_PROCESS = None
                 self.send_json({"status": "success", "message": "Clipper stopped"})
             else:
                 self.send_json({"status": "error", "message": "Not running"})
 
-        # Start verification
+        # Start verification (queued behind a running one)
         elif path == "/verify":
-            if VERIFY_PROCESS and VERIFY_PROCESS.poll() is None:
-                self.send_json({"status": "error", "message": "Verification already running"})
-                return
-
-            pending = load_json(PENDING_FILE, [])
+            pending = load_data("pending")
             if not pending:
                 self.send_json({"status": "error", "message": "No pending creators"})
                 return
 
-            log(f"Starting verification for {len(pending)} creators...")
-            VERIFY_PROCESS = subprocess.Popen(
-                [PYTHON_EXE, "verify_batch.py"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
-            )
-            self.send_json({"status": "success", "message": f"Verifying {len(pending)} creators"})
+            job = JOBS.submit("verify")
+            self.send_job(job, f"Verifying {len(pending)} creators")
 
         # Clear verified only (keep pending)
         elif path == "/clear":
-            save_json(VERIFIED_FILE, {"available": [], "unavailable": []})
+            cleared = [c.get("id") for records in load_data("verified").values() for c in records]
+            STORE.clear_verified()
+            forget_deleted(cleared)
             self.send_json({"status": "success", "message": "Cleared verified creators"})
 
         # Login
@@ -237,10 +684,6 @@ class Handler(http.server.SimpleHTTPRequestHandler):
 
         # Send DM to single creator
         elif path == "/dm/send":
-            # Read request body
-            content_length = int(self.headers.get("Content-Length", 0))
-            body = self.rfile.read(content_length).decode("utf-8")
-
             try:
                 data = json.loads(body)
                 handle = data.get("id", "")
@@ -251,65 +694,56 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                     self.send_json({"status": "error", "message": "No handle provided"})
                     return
 
-                log(f"Sending DM to @{handle}...")
-                DM_PROCESS = subprocess.Popen(
-                    [PYTHON_EXE, "send_dm.py", handle, nickname, lang],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT
-                )
-                self.send_json({"status": "success", "message": f"DM sending to @{handle}"})
+                job = JOBS.submit("dm", {"id": handle, "nickname": nickname, "lang": lang})
+                self.send_job(job, f"DM sending to @{handle}")
 
             except json.JSONDecodeError:
                 self.send_json({"status": "error", "message": "Invalid JSON"})
 
         # Send DM to all available creators
         elif path == "/dm/send-all":
-            if DM_PROCESS and DM_PROCESS.poll() is None:
-                self.send_json({"status": "error", "message": "DM process already running"})
-                return
-
-            # Read request body for lang preference
-            content_length = int(self.headers.get("Content-Length", 0))
-            body = self.rfile.read(content_length).decode("utf-8") if content_length > 0 else "{}"
-
             try:
                 data = json.loads(body) if body else {}
                 lang = data.get("lang", "kr")
 
-                # Get available creators that haven't been DMed
-                verified = load_json(VERIFIED_FILE, {"available": [], "unavailable": []})
-                dm_status = load_json(DM_STATUS_FILE, {"sent": [], "failed": []})
-
-                available = verified.get("available", []) or verified.get("available_creators", [])
-                sent_ids = set(s.get("id") for s in dm_status.get("sent", []))
-
-                to_dm = [c for c in available if c.get("id") not in sent_ids]
-
+                to_dm = creators_to_dm()
                 if not to_dm:
                     self.send_json({"status": "error", "message": "No creators to DM"})
                     return
 
-                log(f"Starting batch DM to {len(to_dm)} creators...")
-
-                # Write batch file for the DM script
-                with open("dm_batch.json", "w", encoding="utf-8") as f:
-                    json.dump({"creators": to_dm, "lang": lang}, f, ensure_ascii=False)
-
-                DM_PROCESS = subprocess.Popen(
-                    [PYTHON_EXE, "send_dm_batch.py"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT
-                )
-                self.send_json({"status": "success", "message": f"DM batch started for {len(to_dm)} creators"})
+                job = JOBS.submit("dm_batch", {"lang": lang})
+                self.send_job(job, f"DM batch started for {len(to_dm)} creators")
 
             except json.JSONDecodeError:
                 self.send_json({"status": "error", "message": "Invalid JSON"})
 
         # Clear DM status
         elif path == "/dm/clear":
-            save_json(DM_STATUS_FILE, {"sent": [], "failed": []})
+            STORE.clear_dm_status()
             self.send_json({"status": "success", "message": "DM status cleared"})
 
+        # Queue a job: {"kind": "verify" | "dm" | "dm_batch" | "crawl", "priority": 0, ...params}
+        elif path == "/jobs":
+            try:
+                data = json.loads(body) if body else {}
+                kind = data.pop("kind", "")
+                priority = int(data.pop("priority", 0))
+            except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+                self.send_json({"status": "error", "message": "Invalid JSON"}, status=400)
+                return
+            if kind not in JOB_KINDS:
+                self.send_json({"status": "error", "message": f"Unknown job kind: {kind}"}, status=400)
+                return
+            if kind == "dm" and not data.get("id"):
+                self.send_json({"status": "error", "message": "No handle provided"}, status=400)
+                return
+            self.send_job(JOBS.submit(kind, data, priority), f"{kind} job")
+
+        # Cancel a queued job, or stop a running one
+        elif path.startswith("/jobs/") and path.endswith("/cancel"):
+            ok, message = JOBS.cancel(path[len("/jobs/"):-len("/cancel")])
+            self.send_json({"status": "success" if ok else "error", "message": message})
+
         else:
             self.send_error(404)
 
@@ -320,17 +754,17 @@ class Handler(http.server.SimpleHTTPRequestHandler):
         # Delete specific creator
         if path.startswith("/pending/"):
             creator_id = path.replace("/pending/", "")
-            pending = load_json(PENDING_FILE, [])
-            pending = [c for c in pending if c["id"] != creator_id]
-            save_json(PENDING_FILE, pending)
+            STORE.remove_pending(creator_id)
+            CREATOR_VIEW.remove("pending", creator_id)
+            forget_deleted([creator_id])
             self.send_json({"status": "success", "message": f"Deleted {creator_id}"})
 
         elif path.startswith("/verified/"):
             creator_id = path.replace("/verified/", "")
-            verified = load_json(VERIFIED_FILE, {"available": [], "unavailable": []})
-            verified["available"] = [c for c in verified["available"] if c["id"] != creator_id]
-            verified["unavailable"] = [c for c in verified["unavailable"] if c["id"] != creator_id]
-            save_json(VERIFIED_FILE, verified)
+            STORE.remove_verified(creator_id)
+            CREATOR_VIEW.remove("available", creator_id)
+            CREATOR_VIEW.remove("unavailable", creator_id)
+            forget_deleted([creator_id])
             self.send_json({"status": "success", "message": f"Deleted {creator_id}"})
 
         else:
@@ -344,5 +778,13 @@ if __name__ == "__main__":
 
     log(f"Server starting on http://localhost:{PORT}")
 
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    if USE_BROWSER_SERVICE:
+        BROWSER_PROCESS = SUPERVISOR.start("browser", [PYTHON_EXE, "browser_service.py"])
+    # The dashboard serves right away; jobs wait for the browser service
+    threading.Thread(target=start_jobs, daemon=True).start()
+    threading.Thread(target=watch_state, daemon=True).start()
+    if hasattr(STORE, "compact"):
+        threading.Thread(target=compact_journal, daemon=True).start()
+
+    with PooledHTTPServer(("", PORT), Handler) as httpd:
         httpd.serve_forever()
@@ -2,6 +2,8 @@ import time
 from playwright.sync_api import sync_playwright
 import os
 
+from browser_service import open_page_sync
+
 USER_DATA_DIR = "./tiktok_user_data"
 
 def setup_login():
@@ -30,15 +32,14 @@ def setup_login():
         print(f"Launching Chrome from: {chrome_path}")
         print(f"User Data Directory: {USER_DATA_DIR}")
         
-        browser = p.chromium.launch_persistent_context(
-            user_data_dir=USER_DATA_DIR,
-            executable_path=chrome_path,
-            headless=False,
-            args=args,
-            viewport=None # Let window decide size
-        )
-        
-        page = browser.pages[0]
+        # Borrows a page from the browser service when it holds the profile
+        page, close_page = open_page_sync(p, "https://www.tiktok.com/ko-KR/", {
+            "user_data_dir": USER_DATA_DIR,
+            "executable_path": chrome_path,
+            "headless": False,
+            "args": args,
+            "viewport": None # Let window decide size
+        })
         
         print("Navigating to TikTok Login (KR)...")
         # Go to KR main first then login, or direct KR login
@@ -85,7 +86,7 @@ def setup_login():
                 break
                 
         print("Closing browser and saving state to disk (via persistent context)...")
-        browser.close()
+        close_page()
         print("Setup complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,917 @@
+"""
+Shared storage for creator state.
+
+Every script reads and writes pending creators, verification results, DM
+status, scan history and validated streamers through get_store(). Two
+backends implement the same methods:
+
+    json    (default) the original *.json files, rewritten on each change
+    sqlite  one SQLite database in WAL mode with single-row upserts
+    journal pending/verified/DM changes appended to a JSONL journal and
+            folded into a snapshot by a background compactor
+
+Select the backend with TIKTOK_STORAGE=json|sqlite|journal. The SQLite and
+journal backends import the JSON files the first time they start empty; to
+run the SQLite import by hand, or to compact the journal:
+
+    python storage.py migrate
+    python storage.py compact
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an in-process lock only
+    fcntl = None
+
+PENDING_FILE = "pending_creators.json"
+VERIFIED_FILE = "verified_creators.json"
+DM_STATUS_FILE = "dm_status.json"
+HISTORY_FILE = "scan_history.json"
+STREAMERS_FILE = "streamers_data.json"
+DB_FILE = "creators.db"
+JOURNAL_FILE = "creators.journal.jsonl"
+SNAPSHOT_FILE = "creators.snapshot.json"
+SEEN_FILE = "seen_handles.txt"
+CLIPPER_STATUS_FILE = "clipper_status.json"
+JOBS_FILE = "jobs.json"
+VERIFY_CHECKPOINT_FILE = "verify_checkpoint.json"
+
+HISTORY_LIMIT = 50
+# Compact once the journal tail grows past this many bytes
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+STORAGE_BACKEND = os.environ.get("TIKTOK_STORAGE", "json")
+
+# Collection name -> (JSON file, default value)
+COLLECTIONS = {
+    "pending": (PENDING_FILE, list),
+    "verified": (VERIFIED_FILE, lambda: {"available": [], "unavailable": []}),
+    "dm_status": (DM_STATUS_FILE, lambda: {"sent": [], "failed": []}),
+    "history": (HISTORY_FILE, list),
+    "streamers": (STREAMERS_FILE, list),
+}
+
+
+_PROCESS_LOCK = threading.Lock()
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Exclusive advisory lock on path, held via a sidecar path + ".lock" file.
+
+    Serializes read-modify-write cycles between processes (fcntl.flock) and
+    between threads of one process. Readers never need it: files are only
+    ever replaced whole by write_json_atomic. shared=True takes a shared
+    lock instead, which only excludes exclusive holders.
+    """
+    if fcntl is None:
+        with _PROCESS_LOCK:
+            yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON to a temp file in the same directory, then os.replace it in.
+
+    Concurrent readers see either the old or the new file, never a
+    truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class JsonStore:
+    """Original file layout: each collection is one JSON file.
+
+    Every change is a locked read-modify-write that replaces the file
+    atomically, so separate processes can update the same file safely.
+    """
+
+    def path(self, name):
+        return COLLECTIONS[name][0]
+
+    def default(self, name):
+        return COLLECTIONS[name][1]()
+
+    def signature(self, name):
+        """Cheap change marker; differs whenever the collection was rewritten."""
+        return _stat_signature(self.path(name))
+
+    def snapshot(self, name):
+        """Return (signature, data) where signature matches the data read."""
+        path = self.path(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                return (st.st_mtime_ns, st.st_size), json.load(f)
+        except (OSError, ValueError):
+            return None, self.default(name)
+
+    def load(self, name):
+        return self.snapshot(name)[1]
+
+    def _write(self, name, data):
+        with file_lock(self.path(name)):
+            write_json_atomic(self.path(name), data)
+
+    def _update(self, name, change):
+        """Run change(data) on the current data under the file lock.
+
+        change mutates data in place and returns a truthy value if anything
+        changed; only then is the file rewritten. Returns change's result.
+        """
+        path = self.path(name)
+        with file_lock(path):
+            data = self.load(name)
+            result = change(data)
+            if result:
+                write_json_atomic(path, data)
+            return result
+
+    # Pending creators
+
+    def load_pending(self):
+        return self.load("pending")
+
+    def add_pending(self, creator):
+        """Append a pending creator; False if the id is already pending."""
+        return self.add_pending_many([creator]) == 1
+
+    def add_pending_many(self, creators):
+        """Append creators whose ids aren't pending yet; returns how many were added."""
+        def change(pending):
+            known = {c.get("id") for c in pending}
+            added = 0
+            for creator in creators:
+                if creator["id"] in known:
+                    continue
+                known.add(creator["id"])
+                pending.append(creator)
+                added += 1
+            return added
+        return self._update("pending", change)
+
+    def remove_pending(self, creator_id):
+        def change(pending):
+            before = len(pending)
+            pending[:] = [c for c in pending if c.get("id") != creator_id]
+            return len(pending) != before
+        self._update("pending", change)
+
+    # Verification results
+
+    def load_verified(self):
+        return self.load("verified")
+
+    def add_verified(self, results):
+        """Save {"available": [...], "unavailable": [...]} results.
+
+        A new result replaces the id's earlier one in either list, so each
+        id keeps only its latest verification (see verify_cache.py).
+        """
+        def change(verified):
+            fresh = {c["id"].lower() for status in ("available", "unavailable") for c in results.get(status, [])}
+            for status in ("available", "unavailable"):
+                kept = [c for c in verified.get(status, []) if c.get("id", "").lower() not in fresh]
+                verified[status] = kept + results.get(status, [])
+            return True
+        self._update("verified", change)
+
+    def remove_verified(self, creator_id):
+        def change(verified):
+            for status in ("available", "unavailable"):
+                verified[status] = [c for c in verified.get(status, []) if c.get("id") != creator_id]
+            return True
+        self._update("verified", change)
+
+    def clear_verified(self):
+        self._write("verified", self.default("verified"))
+
+    # DM status
+
+    def load_dm_status(self):
+        return self.load("dm_status")
+
+    def record_dm(self, kind, entry):
+        """Record a DM outcome; kind is "sent" or "failed"."""
+        def change(dm_status):
+            dm_status.setdefault(kind, []).append(entry)
+            return True
+        self._update("dm_status", change)
+
+    def clear_dm_status(self):
+        self._write("dm_status", self.default("dm_status"))
+
+    # Single-user validation history and results
+
+    def load_history(self):
+        return self.load("history")
+
+    def add_history(self, entry):
+        def change(history):
+            history.insert(0, entry)
+            del history[HISTORY_LIMIT:]
+            return True
+        self._update("history", change)
+
+    def load_streamers(self):
+        return self.load("streamers")
+
+    def add_streamer(self, record):
+        """Add a validated streamer; False if the id is already listed."""
+        def change(existing):
+            if any(e.get("id") == record["id"] for e in existing):
+                return False
+            existing.append(record)
+            return True
+        return self._update("streamers", change)
+
+
+class SqliteStore:
+    """All collections in one SQLite database (WAL mode).
+
+    Records are kept as JSON in a data column next to indexed id/status
+    columns, so loads return the same shapes as JsonStore while every
+    mutation touches a single row. Connections are per thread.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS creators (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL,
+        id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        UNIQUE (status, id)
+    );
+    CREATE INDEX IF NOT EXISTS creators_id ON creators (id);
+    -- Verified results are matched case-insensitively (one latest per id)
+    CREATE INDEX IF NOT EXISTS creators_id_lower ON creators (lower(id));
+    CREATE TABLE IF NOT EXISTS dm_status (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        id TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS dm_status_id ON dm_status (id);
+    CREATE INDEX IF NOT EXISTS dm_status_kind ON dm_status (kind);
+    CREATE TABLE IF NOT EXISTS scan_history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS streamers (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL UNIQUE,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, db_path=DB_FILE):
+        self.db_path = db_path
+        self.local = threading.local()
+        with self.conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def signature(self, name):
+        """Any commit touches the WAL file, so its stat changes with the data."""
+        return (_stat_signature(self.db_path), _stat_signature(self.db_path + "-wal"))
+
+    def snapshot(self, name):
+        # Signature first: a write landing mid-read only causes an extra reload
+        signature = self.signature(name)
+        return signature, self.load(name)
+
+    def load(self, name):
+        return getattr(self, "load_" + name)()
+
+    def _rows(self, sql, args=()):
+        return [json.loads(row[0]) for row in self.conn().execute(sql, args)]
+
+    # Pending creators
+
+    def load_pending(self):
+        return self._rows("SELECT data FROM creators WHERE status = 'pending' ORDER BY seq")
+
+    def add_pending(self, creator):
+        return self.add_pending_many([creator]) == 1
+
+    def add_pending_many(self, creators):
+        with self.conn() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO creators (status, id, data) VALUES ('pending', ?, ?)",
+                [(c["id"], json.dumps(c, ensure_ascii=False)) for c in creators],
+            )
+            return conn.total_changes - before
+
+    def remove_pending(self, creator_id):
+        with self.conn() as conn:
+            conn.execute("DELETE FROM creators WHERE status = 'pending' AND id = ?", (creator_id,))
+
+    # Verification results
+
+    def load_verified(self):
+        return {
+            status: self._rows("SELECT data FROM creators WHERE status = ? ORDER BY seq", (status,))
+            for status in ("available", "unavailable")
+        }
+
+    def add_verified(self, results):
+        rows = [
+            (status, c["id"], json.dumps(c, ensure_ascii=False))
+            for status in ("available", "unavailable")
+            for c in results.get(status, [])
+        ]
+        with self.conn() as conn:
+            # Only the latest result per id, whichever list it lands in
+            conn.executemany(
+                "DELETE FROM creators WHERE status IN ('available', 'unavailable') AND lower(id) = lower(?)",
+                [(row[1],) for row in rows],
+            )
+            conn.executemany(
+                "INSERT INTO creators (status, id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (status, id) DO UPDATE SET data = excluded.data",
+                rows,
+            )
+
+    def remove_verified(self, creator_id):
+        with self.conn() as conn:
+            conn.execute(
+                "DELETE FROM creators WHERE status IN ('available', 'unavailable') AND id = ?",
+                (creator_id,),
+            )
+
+    def clear_verified(self):
+        with self.conn() as conn:
+            conn.execute("DELETE FROM creators WHERE status IN ('available', 'unavailable')")
+
+    # DM status
+
+    def load_dm_status(self):
+        return {
+            kind: self._rows("SELECT data FROM dm_status WHERE kind = ? ORDER BY seq", (kind,))
+            for kind in ("sent", "failed")
+        }
+
+    def record_dm(self, kind, entry):
+        with self.conn() as conn:
+            conn.execute(
+                "INSERT INTO dm_status (kind, id, data) VALUES (?, ?, ?)",
+                (kind, entry.get("id", ""), json.dumps(entry, ensure_ascii=False)),
+            )
+
+    def clear_dm_status(self):
+        with self.conn() as conn:
+            conn.execute("DELETE FROM dm_status")
+
+    # Single-user validation history and results
+
+    def load_history(self):
+        return self._rows("SELECT data FROM scan_history ORDER BY seq DESC LIMIT ?", (HISTORY_LIMIT,))
+
+    def add_history(self, entry):
+        with self.conn() as conn:
+            conn.execute("INSERT INTO scan_history (data) VALUES (?)", (json.dumps(entry, ensure_ascii=False),))
+            conn.execute(
+                "DELETE FROM scan_history WHERE seq <= (SELECT MAX(seq) FROM scan_history) - ?",
+                (HISTORY_LIMIT,),
+            )
+
+    def load_streamers(self):
+        return self._rows("SELECT data FROM streamers ORDER BY seq")
+
+    def add_streamer(self, record):
+        with self.conn() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO streamers (id, data) VALUES (?, ?)",
+                (record["id"], json.dumps(record, ensure_ascii=False)),
+            )
+            return cur.rowcount == 1
+
+    # Migration
+
+    def is_migrated(self):
+        row = self.conn().execute("SELECT value FROM meta WHERE key = 'migrated_at'").fetchone()
+        return row is not None
+
+    def migrate_from(self, source, force=False):
+        """Import every collection from another store; returns per-collection counts.
+
+        Runs once (None if already migrated, unless force) under a file lock
+        on the database and in one transaction, so two processes opening an
+        empty database can't both import. Rows already present are skipped
+        rather than duplicated, so a forced re-run only adds what is new and
+        keeps anything recorded since the first import.
+        """
+        verified = source.load_verified()
+        latest = {}
+        for status in ("available", "unavailable"):
+            for c in verified.get(status, []) or verified.get(status + "_creators", []):
+                key = c.get("id", "").lower()
+                if key and (key not in latest or latest[key][1].get("verified_at", 0) <= c.get("verified_at", 0)):
+                    latest[key] = (status, c)
+        dm_status = source.load_dm_status()
+        pending = source.load_pending()
+        history = source.load_history()
+        streamers = [s for s in source.load_streamers() if s.get("id")]
+
+        with file_lock(self.db_path):
+            if self.is_migrated() and not force:
+                return None
+            conn = self.conn()
+            counts = {}
+            with conn:
+                def run(name, sql, rows):
+                    before = conn.total_changes
+                    conn.executemany(sql, rows)
+                    counts[name] = conn.total_changes - before
+
+                run("pending", "INSERT OR IGNORE INTO creators (status, id, data) VALUES ('pending', ?, ?)",
+                    [(c["id"], json.dumps(c, ensure_ascii=False)) for c in pending])
+                # An id's result already in the database is newer than the file's
+                run("verified",
+                    "INSERT INTO creators (status, id, data) SELECT ?, ?, ? WHERE NOT EXISTS ("
+                    "SELECT 1 FROM creators WHERE status IN ('available', 'unavailable') AND lower(id) = lower(?))",
+                    [(status, c["id"], json.dumps(c, ensure_ascii=False), c["id"]) for status, c in latest.values()])
+                run("dm_status",
+                    "INSERT INTO dm_status (kind, id, data) SELECT ?, ?, ? WHERE NOT EXISTS ("
+                    "SELECT 1 FROM dm_status WHERE kind = ? AND id = ? AND data = ?)",
+                    [(kind, e.get("id", ""), d, kind, e.get("id", ""), d)
+                     for kind in ("sent", "failed")
+                     for e, d in ((e, json.dumps(e, ensure_ascii=False)) for e in dm_status.get(kind, []))])
+                # History is newest-first; insert oldest first so seq order matches
+                run("history",
+                    "INSERT INTO scan_history (data) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM scan_history WHERE data = ?)",
+                    [(d, d) for d in (json.dumps(e, ensure_ascii=False) for e in reversed(history))])
+                conn.execute(
+                    "DELETE FROM scan_history WHERE seq <= (SELECT MAX(seq) FROM scan_history) - ?",
+                    (HISTORY_LIMIT,),
+                )
+                run("streamers", "INSERT OR IGNORE INTO streamers (id, data) VALUES (?, ?)",
+                    [(r["id"], json.dumps(r, ensure_ascii=False)) for r in streamers])
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_at', ?)",
+                    (str(int(time.time() * 1000)),),
+                )
+        return counts
+
+
+class JournalStore(JsonStore):
+    """Pending, verification and DM state as an append-only JSONL journal.
+
+    Each change is one event line (creator_added, verified, deleted,
+    dm_sent, dm_failed, verified_cleared, dm_cleared) appended with a
+    single write(), so capturing a creator costs the same however long the
+    list is. State is the last snapshot plus the journal after the offset
+    it records; readers keep it in memory and only read new journal bytes.
+
+    compact() folds the journal into a new snapshot and starts an empty
+    journal. Appenders hold a shared lock on the journal and the compactor
+    an exclusive one, so no event lands in a journal being replaced. The
+    journal's first line names it; the snapshot records that name, and a
+    mismatch means a compaction stopped after writing the snapshot, whose
+    state then already includes the old journal.
+
+    Scan history and validated streamers stay in their JSON files.
+    """
+
+    JOURNALED = ("pending", "verified", "dm_status")
+
+    def __init__(self, journal_path=JOURNAL_FILE, snapshot_path=SNAPSHOT_FILE):
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path
+        self.lock = threading.Lock()
+        self.journal = None  # open journal file, positioned at offset
+        self.journal_ino = None
+        self.offset = 0
+        self._reset_state()
+
+    def _reset_state(self):
+        self.pending = {}
+        # status -> {lowercased id: latest record}
+        self.verified = {"available": {}, "unavailable": {}}
+        self.dm_status = {"sent": [], "failed": []}
+
+    # Reading
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_all(self):
+        """Load snapshot + journal; False if the pair needs repair first."""
+        snapshot = self._read_snapshot()
+        try:
+            journal = open(self.journal_path, "rb")
+        except OSError:
+            return False
+        header = journal.readline()
+        try:
+            journal_id = json.loads(header).get("id")
+        except ValueError:
+            journal_id = None
+        if snapshot is None or snapshot.get("journal") != journal_id:
+            journal.close()
+            return False
+
+        self._reset_state()
+        for c in snapshot.get("pending", []):
+            self.pending[c["id"]] = c
+        for status, records in self.verified.items():
+            for c in snapshot.get("verified", {}).get(status, []):
+                key = c.get("id", "").lower()
+                if not key:
+                    continue
+                # Snapshots from before results were deduplicated can repeat an id
+                older = [r for r in self.verified.values() if key in r]
+                if older and older[0][key].get("verified_at", 0) > c.get("verified_at", 0):
+                    continue
+                for other in older:
+                    del other[key]
+                records[key] = c
+        for kind in self.dm_status:
+            self.dm_status[kind] = snapshot.get("dm_status", {}).get(kind, [])
+
+        if self.journal:
+            self.journal.close()
+        self.journal = journal
+        self.journal_ino = os.fstat(journal.fileno()).st_ino
+        self.offset = max(snapshot.get("offset", 0), len(header))
+        journal.seek(self.offset)
+        self._read_tail()
+        return True
+
+    def _read_tail(self):
+        """Apply complete event lines appended since offset."""
+        data = self.journal.read()
+        end = data.rfind(b"\n") + 1
+        if not end:
+            self.journal.seek(self.offset)
+            return
+        # A line still being written stays unread until its newline lands
+        self.journal.seek(self.offset + end)
+        self.offset += end
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def _apply(self, event):
+        kind = event["event"]
+        if kind == "creator_added":
+            creator = event["creator"]
+            self.pending.setdefault(creator["id"], creator)
+        elif kind == "verified":
+            # The latest result replaces the id's earlier one in either list
+            key = event["creator"]["id"].lower()
+            for records in self.verified.values():
+                records.pop(key, None)
+            self.verified[event["status"]][key] = event["creator"]
+        elif kind == "deleted":
+            creator_id = event["id"]
+            if event["status"] == "pending":
+                self.pending.pop(creator_id, None)
+            else:
+                for records in self.verified.values():
+                    if records.get(creator_id.lower(), {}).get("id") == creator_id:
+                        del records[creator_id.lower()]
+        elif kind == "dm_sent":
+            self.dm_status["sent"].append(event["entry"])
+        elif kind == "dm_failed":
+            self.dm_status["failed"].append(event["entry"])
+        elif kind == "verified_cleared":
+            self.verified = {"available": {}, "unavailable": {}}
+        elif kind == "dm_cleared":
+            self.dm_status = {"sent": [], "failed": []}
+
+    def _repair(self):
+        """Create or re-create the snapshot/journal pair (exclusive lock held)."""
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            # First start: seed from the JSON files
+            source = JsonStore()
+            verified = source.load_verified()
+            snapshot = {
+                "journal": uuid.uuid4().hex,
+                "pending": list({c["id"]: c for c in source.load_pending() if c.get("id")}.values()),
+                "verified": {
+                    "available": verified.get("available", []) or verified.get("available_creators", []),
+                    "unavailable": verified.get("unavailable", []) or verified.get("unavailable_creators", []),
+                },
+                "dm_status": source.load_dm_status(),
+            }
+        self._write_pair(snapshot)
+
+    def _write_pair(self, snapshot):
+        """Write snapshot, then replace the journal with an empty one it names."""
+        header = (json.dumps({"event": "journal", "id": snapshot["journal"]}) + "\n").encode()
+        snapshot["offset"] = len(header)
+        write_json_atomic(self.snapshot_path, snapshot, indent=None)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+        os.replace(tmp_path, self.journal_path)
+
+    def refresh(self):
+        """Bring in-memory state up to date (caller holds self.lock)."""
+        try:
+            ino = os.stat(self.journal_path).st_ino
+        except OSError:
+            ino = None
+        if self.journal and ino == self.journal_ino:
+            self._read_tail()
+            return
+        # First read, or the journal was replaced by a compaction
+        with file_lock(self.journal_path, shared=True):
+            if self._read_all():
+                return
+        with file_lock(self.journal_path):
+            if not self._read_all():
+                self._repair()
+                self._read_all()
+
+    # Writing
+
+    def _append(self, *events):
+        data = b"".join((json.dumps(e, ensure_ascii=False) + "\n").encode() for e in events)
+        if not data:
+            return
+        with self.lock:
+            if not self.journal:
+                self.refresh()
+        with file_lock(self.journal_path, shared=True):
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def compact(self):
+        """Fold the journal into a new snapshot; returns bytes folded."""
+        with self.lock, file_lock(self.journal_path):
+            if not self._read_all():
+                self._repair()
+                return 0
+            folded = self.offset
+            self._write_pair({
+                "journal": uuid.uuid4().hex,
+                "pending": list(self.pending.values()),
+                "verified": {status: list(records.values()) for status, records in self.verified.items()},
+                "dm_status": self.dm_status,
+            })
+            self.journal.close()
+            self.journal = None
+            return folded
+
+    def needs_compaction(self):
+        try:
+            return os.path.getsize(self.journal_path) > JOURNAL_COMPACT_BYTES
+        except OSError:
+            return False
+
+    # Collection access
+
+    def signature(self, name):
+        if name not in self.JOURNALED:
+            return super().signature(name)
+        return (_stat_signature(self.snapshot_path), _stat_signature(self.journal_path))
+
+    def snapshot(self, name):
+        if name not in self.JOURNALED:
+            return super().snapshot(name)
+        # Signature first: an append landing mid-read only causes an extra reload
+        signature = self.signature(name)
+        return signature, self.load(name)
+
+    def load(self, name):
+        if name not in self.JOURNALED:
+            return super().load(name)
+        return getattr(self, "load_" + name)()
+
+    # Pending creators
+
+    def load_pending(self):
+        with self.lock:
+            self.refresh()
+            return list(self.pending.values())
+
+    def add_pending_many(self, creators):
+        with self.lock:
+            self.refresh()
+            known = set(self.pending)
+        fresh = []
+        for creator in creators:
+            if creator["id"] not in known:
+                known.add(creator["id"])
+                fresh.append({"event": "creator_added", "creator": creator})
+        self._append(*fresh)
+        return len(fresh)
+
+    def remove_pending(self, creator_id):
+        self._append({"event": "deleted", "status": "pending", "id": creator_id})
+
+    # Verification results
+
+    def load_verified(self):
+        with self.lock:
+            self.refresh()
+            return {status: list(records.values()) for status, records in self.verified.items()}
+
+    def add_verified(self, results):
+        self._append(*(
+            {"event": "verified", "status": status, "creator": c}
+            for status in ("available", "unavailable")
+            for c in results.get(status, [])
+        ))
+
+    def remove_verified(self, creator_id):
+        self._append({"event": "deleted", "status": "verified", "id": creator_id})
+
+    def clear_verified(self):
+        self._append({"event": "verified_cleared"})
+
+    # DM status
+
+    def load_dm_status(self):
+        with self.lock:
+            self.refresh()
+            return {kind: list(entries) for kind, entries in self.dm_status.items()}
+
+    def record_dm(self, kind, entry):
+        self._append({"event": "dm_sent" if kind == "sent" else "dm_failed", "entry": entry})
+
+    def clear_dm_status(self):
+        self._append({"event": "dm_cleared"})
+
+
+class SeenIndex:
+    """Creator handles already captured, as an on-disk set (one per line).
+
+    The file is read once and then only the lines appended since, by this
+    process or another clipper, so membership checks stay O(1). seed_from()
+    adds every pending, verified and DMed creator, covering captures made
+    before the index existed. forget() appends "-handle" lines, so a creator
+    deleted from the dashboard can be captured again, also by a clipper
+    that is already running. Handles are compared case-insensitively.
+    """
+
+    def __init__(self, path=SEEN_FILE):
+        self.path = path
+        self.ids = set()
+        self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # Truncated or replaced: start over
+                    self.offset = 0
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        for line in data[:end].decode("utf-8", "replace").splitlines():
+            # Handles never start with "-"; such a line forgets one
+            if line.startswith("-"):
+                self.ids.discard(line[1:])
+            elif line:
+                self.ids.add(line)
+
+    def __contains__(self, handle):
+        self.refresh()
+        return handle.lower() in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_many(self, handles):
+        """Record handles; returns how many were new."""
+        self.refresh()
+        fresh = {h.lower() for h in handles if h} - self.ids
+        if not fresh:
+            return 0
+        self._append("".join(h + "\n" for h in sorted(fresh)))
+        self.ids |= fresh
+        return len(fresh)
+
+    def add(self, handle):
+        return self.add_many([handle]) == 1
+
+    def forget(self, handles):
+        """Let handles be captured again; returns how many were seen."""
+        self.refresh()
+        gone = {h.lower() for h in handles if h} & self.ids
+        if not gone:
+            return 0
+        self._append("".join("-" + h + "\n" for h in sorted(gone)))
+        self.ids -= gone
+        return len(gone)
+
+    def _append(self, text):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, text.encode())
+        finally:
+            os.close(fd)
+
+    def seed_from(self, store):
+        """Add every creator the store knows about; returns how many were new."""
+        return self.add_many(known_handles(store))
+
+
+def known_handles(store):
+    """Lowercased ids of every pending, verified and DMed creator."""
+    verified = store.load_verified()
+    ids = [c.get("id") for c in store.load_pending()]
+    for status in ("available", "unavailable"):
+        ids.extend(c.get("id") for c in verified.get(status, []) or verified.get(status + "_creators", []))
+    ids.extend(entry.get("id") for entry in store.load_dm_status().get("sent", []))
+    return {i.lower() for i in ids if i}
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store():
+    """Process-wide store for the configured backend."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            if STORAGE_BACKEND == "sqlite":
+                store = SqliteStore()
+                if not store.is_migrated():
+                    store.migrate_from(JsonStore())
+                _STORE = store
+            elif STORAGE_BACKEND == "journal":
+                _STORE = JournalStore()
+            else:
+                _STORE = JsonStore()
+        return _STORE
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "compact":
+        folded = JournalStore().compact()
+        print(f"Compacted {folded} journal bytes into {SNAPSHOT_FILE}")
+        sys.exit(0)
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python storage.py migrate [--force] | compact")
+        sys.exit(1)
+    counts = SqliteStore().migrate_from(JsonStore(), force="--force" in sys.argv)
+    if counts is None:
+        print(f"{DB_FILE} was already migrated (use --force to import again)")
+        sys.exit(0)
+    for name, count in counts.items():
+        print(f"  {name}: {count} imported")
+    print(f"Migrated JSON files into {DB_FILE}")
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+# Output lines kept per run, and finished runs kept for /processes
+OUTPUT_TAIL_LINES = 200
+RUN_HISTORY = 20
+
+
+class Job:
+    """One supervised child process and the tail of its output."""
+
+    def __init__(self, name, args, proc):
+        self.name = name
+        self.args = args
+        self.proc = proc
+        self.started_at = time.time()
+        self.ended_at = None
+        self.exit_code = None
+        self.output = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.reader = None
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def poll(self):
+        return self.proc.poll()
+
+    def terminate(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+
+    def snapshot(self, tail=OUTPUT_TAIL_LINES):
+        end = self.ended_at or time.time()
+        return {
+            "name": self.name,
+            "pid": self.proc.pid,
+            "running": self.exit_code is None,
+            "exit_code": self.exit_code,
+            "started_at": int(self.started_at * 1000),
+            "ended_at": int(self.ended_at * 1000) if self.ended_at else None,
+            "duration": round(end - self.started_at, 1),
+            "tail": list(self.output)[-tail:] if tail else [],
+        }
+
+
+class Supervisor:
+    """Starts child processes and drains their output on background threads.
+
+    A child writing to a pipe nobody reads blocks once the pipe buffer
+    fills, so every child's stdout+stderr is read line by line into a
+    bounded tail (Job.output). stdout carries the child's own log() lines
+    and progress prints, which its log file already has or which only
+    matter in the tail; stderr (tracebacks, warnings) also goes to log with
+    the job name. When a child exits its code and duration are recorded
+    and on_exit(job) runs.
+    """
+
+    def __init__(self, log, on_exit=None):
+        self.log = log
+        self.on_exit = on_exit
+        self.lock = threading.Lock()
+        self.current = {}
+        self.history = deque(maxlen=RUN_HISTORY)
+
+    def start(self, name, args):
+        proc = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            # Line-by-line output instead of 8 KB blocks, so the tail is live
+            env=dict(os.environ, PYTHONUNBUFFERED="1"),
+        )
+        job = Job(name, args, proc)
+        job.reader = threading.Thread(target=self._drain, args=(job,), name=f"drain-{name}", daemon=True)
+        with self.lock:
+            self.current[name] = job
+        job.reader.start()
+        return job
+
+    def _drain(self, job):
+        errors = threading.Thread(target=self._drain_stream, args=(job, job.proc.stderr, True), daemon=True)
+        errors.start()
+        self._drain_stream(job, job.proc.stdout, False)
+        errors.join()
+        exit_code = job.proc.wait()
+        with self.lock:
+            job.exit_code = exit_code
+            job.ended_at = time.time()
+            self.history.append(job)
+        self.log(f"{job.name} exited with code {job.exit_code} after {job.ended_at - job.started_at:.1f}s")
+        if self.on_exit:
+            self.on_exit(job)
+
+    def _drain_stream(self, job, stream, to_log):
+        for raw in stream:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            job.output.append(line)
+            if to_log and line:
+                self.log(f"[{job.name}] {line}")
+        stream.close()
+
+    def jobs(self, name=None, tail=OUTPUT_TAIL_LINES):
+        """Snapshots of running jobs and recent runs, newest first."""
+        with self.lock:
+            runs = list(self.history) + [j for j in self.current.values() if j.exit_code is None]
+        runs.sort(key=lambda j: j.started_at, reverse=True)
+        return [j.snapshot(tail) for j in runs if name is None or j.name == name]
@@ -1,23 +1,24 @@
 import asyncio
 import sys
-import json
 import os
 import time
 from datetime import datetime
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+
+from app_logging import get_log
+from backstage_flow import (
+    RESULT_ROWS, STATUSES, StepTimer, classify_text, extract_rows, match_rows, open_invite_dialog,
+    submit_ids, wait_for_backstage, wait_for_rows,
+)
+from browser_service import open_page
+from storage import get_store
+from verify_cache import VerifyCache
 
 USER_DATA_DIR = "./tiktok_user_data"
-HISTORY_FILE = "scan_history.json"
-OUTPUT_FILE = "streamers_data.json"
 BACKSTAGE_URL = "https://live-backstage.tiktok.com/portal/anchor/relation"
 
-def log_debug(msg):
-    """Log to console and file."""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line)
-    with open("validation_debug.log", "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+DEBUG_LOG_FILE = "validation_debug.log"
+log_debug = get_log(DEBUG_LOG_FILE)
 
 def show_notification(title, message, sound="Ping"):
     """Display macOS notification."""
@@ -27,44 +28,67 @@ def show_notification(title, message, sound="Ping"):
 
 def save_history(entry):
     """Save result to history file."""
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                history = json.load(f)
-        except:
-            pass
-
-    history.insert(0, entry)
-    history = history[:50]  # Keep last 50
-
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    get_store().add_history(entry)
 
 def save_to_streamers(username, status):
     """Save qualified user to streamers file."""
-    existing = []
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-        except:
-            pass
-
-    if not any(e.get("id") == username for e in existing):
-        existing.append({
-            "id": username,
-            "nickname": username,
-            "url": f"https://www.tiktok.com/@{username}",
-            "source": "clipper_bot",
-            "backstage": status,
-            "verified_at": datetime.now().isoformat()
-        })
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-
-async def validate_on_backstage(username):
-    """Validate a single user on TikTok Backstage."""
+    get_store().add_streamer({
+        "id": username,
+        "nickname": username,
+        "url": f"https://www.tiktok.com/@{username}",
+        "source": "clipper_bot",
+        "backstage": status,
+        "verified_at": datetime.now().isoformat()
+    })
+
+def save_verified(username, status):
+    """Record the result in the verification cache shared with verify_batch.
+
+    The record replaces the creator's earlier one, so the nickname (and id
+    spelling) the clipper or batch verify stored is carried over.
+    """
+    store = get_store()
+    known = VerifyCache(store.load_verified()).records.get(username.lower())
+    if known is None:
+        known = next((c for c in store.load_pending() if c.get("id", "").lower() == username.lower()), {})
+    record = {
+        "id": known.get("id", username),
+        "status": status,
+        "reason": STATUSES[status][0],
+        "verified_at": int(time.time() * 1000)
+    }
+    if known.get("nickname"):
+        record["nickname"] = known["nickname"]
+    store.add_verified({"available" if status == "available" else "unavailable": [record]})
+
+def apply_status(result, username, status, note=""):
+    """Fill result and notify for a Backstage status (None = no row for the user)."""
+    if status == "available":
+        result["status"] = "PASS"
+        result["reason"] = "✅ 사용 가능 (Backstage)" + note
+        result["verified"] = True
+        save_to_streamers(username, "Available")
+        show_notification("✅ 영입 가능!", f"@{username} 사용 가능", "Glass")
+    elif status == "ineligible":
+        result["reason"] = "❌ 부적격 (Ineligible)" + note
+        show_notification("❌ 부적격", f"@{username} 부적격", "Basso")
+    elif status == "bound":
+        result["reason"] = "❌ 이미 바인딩됨" + note
+        show_notification("❌ 바인딩됨", f"@{username} 이미 소속", "Basso")
+    elif status:
+        label = STATUSES[status][0]
+        result["reason"] = f"❌ {label}" + note
+        show_notification("❌ 확인 필요", f"@{username}: {label}", "Basso")
+    else:
+        result["reason"] = "❌ 테이블에서 찾을 수 없음"
+        show_notification("❌ 검증 실패", f"@{username} 결과 없음", "Basso")
+
+async def validate_on_backstage(username, recheck=False):
+    """Validate a single user on TikTok Backstage.
+
+    A result still fresh in the verification cache is returned without
+    opening Backstage unless recheck is set.
+    """
     log_debug(f"Starting validation for: {username}")
 
     result = {
@@ -77,11 +101,19 @@ async def validate_on_backstage(username):
         "check_time": int(time.time() * 1000)
     }
 
+    cached = None if recheck else VerifyCache(get_store().load_verified()).get(username)
+    if cached:
+        checked = datetime.fromtimestamp(cached["verified_at"] / 1000).strftime("%m-%d %H:%M")
+        log_debug(f"Cached result from {checked}: {cached['status']}")
+        apply_status(result, username, cached["status"], f" · {checked} 확인")
+        log_debug(f"Result: {result['status']} - {result['reason']}")
+        return result
+
     chrome_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
 
     try:
         async with async_playwright() as p:
-            log_debug("Launching browser...")
+            log_debug("Opening browser...")
 
             launch_args = {
                 "user_data_dir": os.path.abspath(USER_DATA_DIR),
@@ -97,135 +129,79 @@ async def validate_on_backstage(username):
             if os.path.exists(chrome_path):
                 launch_args["executable_path"] = chrome_path
 
-            context = await p.chromium.launch_persistent_context(**launch_args)
-            page = context.pages[0] if context.pages else await context.new_page()
+            page, close_page = await open_page(p, BACKSTAGE_URL, launch_args, log_debug)
+            timer = StepTimer()
 
             try:
-                # 1. Navigate to Backstage
-                log_debug(f"Navigating to {BACKSTAGE_URL}...")
-                await page.goto(BACKSTAGE_URL, timeout=30000, wait_until="domcontentloaded")
-                await asyncio.sleep(3)
+                # 1. Navigate to Backstage (a warm page is already there)
+                if not page.url.startswith(BACKSTAGE_URL):
+                    log_debug(f"Navigating to {BACKSTAGE_URL}...")
+                    await page.goto(BACKSTAGE_URL, timeout=30000, wait_until="domcontentloaded")
+
+                try:
+                    ready = await wait_for_backstage(page, timer)
+                except PlaywrightTimeoutError as e:
+                    log_debug(f"Add Host button not found: {e}")
+                    await page.screenshot(path="debug_no_button.png")
+                    result["reason"] = "Add Host 버튼 없음 (로그인 확인)"
+                    return result
 
-                current_url = page.url
-                log_debug(f"Current URL: {current_url}")
+                log_debug(f"Current URL: {page.url}")
 
                 # Check if redirected to login
-                if "login" in current_url.lower() or "signin" in current_url.lower():
+                if ready == "login":
                     log_debug("Login required!")
                     result["reason"] = "Backstage 로그인 필요"
                     show_notification("로그인 필요", "Backstage 로그인이 필요합니다", "Basso")
                     return result
 
                 # 2. Click "Add Host" button
-                log_debug("Looking for Add Host button...")
-                add_btn = 'button[data-e2e-tag="host_manageRelationship_addHostBtn"]'
-
+                log_debug("Opening Add Host dialog...")
                 try:
-                    await page.wait_for_selector(add_btn, timeout=10000)
-                    await page.click(add_btn)
-                    log_debug("Clicked Add Host button")
-                except Exception as e:
-                    log_debug(f"Add Host button not found: {e}")
+                    await open_invite_dialog(page, timer)
+                except PlaywrightTimeoutError as e:
+                    log_debug(f"Add Host dialog did not open: {e}")
                     await page.screenshot(path="debug_no_button.png")
-                    result["reason"] = "Add Host 버튼 없음 (로그인 확인)"
+                    result["reason"] = "입력창 없음"
                     return result
 
-                await asyncio.sleep(2)
-
-                # 3. Enter username in textarea
+                # 3. Enter username and click Next
                 log_debug(f"Entering username: {username}")
-                textarea = 'textarea[data-testid="inviteHostTextArea"]'
-
                 try:
-                    await page.wait_for_selector(textarea, timeout=5000)
-                    await page.fill(textarea, username)
-                except Exception as e:
-                    log_debug(f"Textarea not found: {e}")
-                    result["reason"] = "입력창 없음"
-                    return result
-
-                await asyncio.sleep(1)
-
-                # 4. Click Next button
-                log_debug("Clicking Next button...")
-                clicked = False
-
-                for selector in ["button:has-text('다음')", "button:has-text('Next')", ".semi-modal-content button.semi-button-primary"]:
-                    try:
-                        if await page.query_selector(selector):
-                            await page.click(selector)
-                            clicked = True
-                            log_debug(f"Clicked: {selector}")
-                            break
-                    except:
-                        continue
-
-                if not clicked:
-                    log_debug("Next button not found")
+                    await submit_ids(page, [username], timer)
+                except PlaywrightTimeoutError as e:
+                    log_debug(f"Next button not found: {e}")
                     result["reason"] = "다음 버튼 없음"
                     return result
 
-                await asyncio.sleep(4)
-
-                # 5. Analyze results table
+                # 4. Wait for the result row
                 log_debug("Analyzing results...")
-                await page.screenshot(path="debug_results.png")
-
-                # Wait for table
                 try:
-                    await page.wait_for_selector(".semi-table-tbody", timeout=8000)
-                except:
-                    log_debug("Results table not found")
-                    result["reason"] = "결과 테이블 없음"
-                    return result
-
-                rows = await page.query_selector_all('.semi-table-tbody tr[role="row"]')
+                    await wait_for_rows(page, [username], timer)
+                except PlaywrightTimeoutError:
+                    if not await page.query_selector(RESULT_ROWS):
+                        log_debug("Results table not found")
+                        await page.screenshot(path="debug_results.png")
+                        result["reason"] = "결과 테이블 없음"
+                        return result
+
+                rows = await extract_rows(page)
                 log_debug(f"Found {len(rows)} rows")
 
                 found_status = None
-                for row in rows:
-                    try:
-                        text = await row.inner_text()
-                        log_debug(f"Row text: {text[:100]}...")
-
-                        if username.lower() in text.lower():
-                            if "사용 가능" in text or "Available" in text:
-                                found_status = "Available"
-                            elif "부적격" in text or "Ineligible" in text:
-                                found_status = "Ineligible"
-                            elif "바인딩" in text or "Bound" in text:
-                                found_status = "Already Bound"
-                            else:
-                                found_status = "Unknown"
-                            break
-                    except Exception as e:
-                        log_debug(f"Error parsing row: {e}")
-
-                # Set result based on status
-                if found_status == "Available":
-                    result["status"] = "PASS"
-                    result["reason"] = "✅ 사용 가능 (Backstage)"
-                    result["verified"] = True
-                    save_to_streamers(username, "Available")
-                    show_notification("✅ 영입 가능!", f"@{username} 사용 가능", "Glass")
-                elif found_status == "Ineligible":
-                    result["reason"] = "❌ 부적격 (Ineligible)"
-                    show_notification("❌ 부적격", f"@{username} 부적격", "Basso")
-                elif found_status == "Already Bound":
-                    result["reason"] = "❌ 이미 바인딩됨"
-                    show_notification("❌ 바인딩됨", f"@{username} 이미 소속", "Basso")
-                elif found_status:
-                    result["reason"] = f"❌ {found_status}"
-                    show_notification("❌ 확인 필요", f"@{username}: {found_status}", "Basso")
-                else:
-                    result["reason"] = "❌ 테이블에서 찾을 수 없음"
-                    show_notification("❌ 검증 실패", f"@{username} 결과 없음", "Basso")
+                row = match_rows(rows, [username]).get(username)
+                if row:
+                    log_debug(f"Row text: {row['text'][:100]}...")
+                    found_status = classify_text(" ".join(row["cells"][1:]) or row["text"])
+                    save_verified(username, found_status)
+
+                apply_status(result, username, found_status)
 
                 log_debug(f"Result: {result['status']} - {result['reason']}")
 
             finally:
-                await asyncio.sleep(2)
-                await context.close()
+                log_debug(f"Step timings:\n{timer.report()}")
+                await close_page()
 
     except Exception as e:
         log_debug(f"Exception: {e}")
@@ -234,22 +210,22 @@ async def validate_on_backstage(username):
 
     return result
 
-async def main(username):
+async def main(username, recheck=False):
     # Clear previous debug log
-    with open("validation_debug.log", "w") as f:
+    with open(DEBUG_LOG_FILE, "w") as f:
         f.write("")
 
     log_debug(f"=== Validation Start: {username} ===")
 
-    result = await validate_on_backstage(username)
+    result = await validate_on_backstage(username, recheck)
     save_history(result)
 
     log_debug(f"=== Validation End ===")
     print(f"\nResult: {result['status']} - {result['reason']}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        target = sys.argv[1]
-        asyncio.run(main(target))
+    args = [a for a in sys.argv[1:] if a != "--recheck"]
+    if args:
+        asyncio.run(main(args[0], "--recheck" in sys.argv))
     else:
-        print("Usage: python3 validate_single.py <username>")
+        print("Usage: python3 validate_single.py <username> [--recheck]")
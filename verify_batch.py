@@ -1,27 +1,28 @@
+import argparse
 import asyncio
 import json
 import os
 import time
 import sys
-from datetime import datetime
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+
+from app_logging import get_log
+from backstage_flow import (
+    RESULT_ROWS, STATUSES, ResponseCapture, StepTimer, classify_text, extract_rows, match_rows,
+    open_invite_dialog, submit_ids, wait_for_backstage, wait_for_login, wait_for_rows,
+)
+from browser_service import open_page
+from storage import VERIFY_CHECKPOINT_FILE, get_store, write_json_atomic
+from verify_cache import VerifyCache, parse_ttl, status_ttl_hours
 
 USER_DATA_DIR = "./tiktok_user_data"
-PENDING_FILE = "pending_creators.json"
-VERIFIED_FILE = "verified_creators.json"
 BACKSTAGE_URL = "https://live-backstage.tiktok.com/portal/anchor/relation"
 LOG_FILE = "verify.log"
+# An unfinished run's checkpoint is resumed only if it is newer than this
+CHECKPOINT_TTL_HOURS = 24
 
 
-def log(msg):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    line = f"[{timestamp}] {msg}"
-    print(line)
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except:
-        pass
+log = get_log(LOG_FILE)
 
 
 def _find_chrome_executable():
@@ -44,59 +45,186 @@ def _find_chrome_executable():
     return ""
 
 
-def load_pending():
-    if os.path.exists(PENDING_FILE):
-        try:
-            with open(PENDING_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return []
-
-
-def save_pending(data):
-    with open(PENDING_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
+MAX_VERIFY_COUNT = 30  # TikTok Backstage limit per Add Host dialog
+
+STATUS_LABELS = {
+    "available": "Available",
+    "ineligible": "Ineligible",
+    "bound": "Already bound",
+    "not_qualified": "Not qualified",
+    "unknown": "Unknown status",
+}
+# "dom": parse the result table only; "api": read eligibility from
+# Backstage's JSON response, table only for ids it didn't cover. The
+# endpoint and schema behind "api" are still guessed (the only fixture is
+# a hand-made sample), so it stays opt-in until recorded responses are
+# committed as fixtures with their expected statuses.
+VERIFY_MODE = os.environ.get("VERIFY_MODE", "dom")
+# How long a chunk waits for its first eligibility response (ms); once one
+# arrives, ids it left out go to the table after RESPONSE_SETTLE_MS
+API_WAIT_MS = 8000
+RESPONSES_DIR = "backstage_responses"
+
+
+def load_checkpoint(ttl_hours=CHECKPOINT_TTL_HOURS):
+    """Ids an unfinished earlier run already submitted, if it is within the TTL."""
+    try:
+        with open(VERIFY_CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if checkpoint.get("finished"):
+        return set()
+    if time.time() * 1000 - checkpoint.get("updated_at", 0) > ttl_hours * 3600 * 1000:
+        return set()
+    return {i.lower() for i in checkpoint.get("done", [])}
 
-def load_verified():
-    if os.path.exists(VERIFIED_FILE):
-        try:
-            with open(VERIFIED_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return {"available": [], "unavailable": []}
 
+def save_checkpoint(checkpoint):
+    checkpoint["pid"] = os.getpid()
+    checkpoint["updated_at"] = int(time.time() * 1000)
+    write_json_atomic(VERIFY_CHECKPOINT_FILE, checkpoint, indent=None)
 
-def save_verified(data):
-    with open(VERIFIED_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
+async def open_backstage(page, timer, reload=True):
+    """Load the relation page, waiting for a manual login if needed. False on timeout.
 
-MAX_VERIFY_COUNT = 30  # TikTok Backstage limit
+    reload=False keeps a page that is already there (a warm page from the
+    browser service).
+    """
+    if reload or not page.url.startswith(BACKSTAGE_URL):
+        log(f"Navigating to {BACKSTAGE_URL}...")
+        await page.goto(BACKSTAGE_URL, timeout=30000, wait_until="domcontentloaded")
 
-async def verify_all():
-    pending = load_pending()
+    try:
+        if await wait_for_backstage(page, timer) == "login":
+            log("Not logged in. Please log in to Backstage in the opened browser...")
+            await wait_for_login(page, timer)
+            log("Login detected. Continuing...")
+    except PlaywrightTimeoutError:
+        log("ERROR: Backstage did not load (or login timed out)")
+        await page.screenshot(path="debug_batch_error.png")
+        return False
+    return True
+
+
+async def verify_chunk(page, ids, nickname_map, timer, capture=None):
+    """Run one Add Host dialog for up to MAX_VERIFY_COUNT ids.
+
+    With capture (a ResponseCapture on page), statuses come from the
+    eligibility response and the table is read only for ids it missed.
+    Returns {"available": [...], "unavailable": [...]}, or None when the
+    dialog could not be driven (the run stops and a later run resumes).
+    """
+    log("Clicking Add Host button...")
+    try:
+        await open_invite_dialog(page, timer)
+    except PlaywrightTimeoutError:
+        log("ERROR: Add Host dialog did not open")
+        await page.screenshot(path="debug_batch_error.png")
+        return None
+
+    if capture:
+        capture.clear()
+    log(f"Entering {len(ids)} IDs and clicking Next...")
+    try:
+        await submit_ids(page, ids, timer)
+    except PlaywrightTimeoutError:
+        log("ERROR: Textarea or Next button not found")
+        return None
+
+    statuses = {}
+    if capture:
+        statuses = await capture.wait(ids, timer, timeout=API_WAIT_MS)
+        log(f"Eligibility response covered {len(statuses)}/{len(ids)} IDs")
+
+    missing = [uid for uid in ids if uid not in statuses]
+    if missing:
+        log("Waiting for results table...")
+        try:
+            await wait_for_rows(page, missing, timer)
+        except PlaywrightTimeoutError:
+            if not await page.query_selector(RESULT_ROWS) and not statuses:
+                log("ERROR: Results table not found")
+                await page.screenshot(path="debug_batch_results.png")
+                return None
+            log("Results incomplete; parsing the rows that are there")
+
+        rows = await extract_rows(page)
+        log(f"Found {len(rows)} rows")
+        for matched_id, row in match_rows(rows, missing).items():
+            # Status columns only, so a nickname can't look like a status
+            statuses[matched_id] = classify_text(" ".join(row["cells"][1:]) or row["text"])
+
+    results = {"available": [], "unavailable": []}
+    now = int(time.time() * 1000)
+    for matched_id in ids:
+        status = statuses.get(matched_id)
+        if status is None:
+            continue
+        log(f"  {'OK' if status == 'available' else '??' if status == 'unknown' else 'NO'} "
+            f"{matched_id}: {STATUS_LABELS[status]}")
+        results["available" if status == "available" else "unavailable"].append({
+            "id": matched_id,
+            "nickname": nickname_map.get(matched_id, ""),
+            "status": status,
+            "reason": STATUSES[status][0],
+            "verified_at": now
+        })
+
+    return results
+
+
+async def verify_all(ttl_hours=None, mode=VERIFY_MODE, record=False, resume=True):
+    """Verify the pending creators without a fresh result, in MAX_VERIFY_COUNT-id chunks.
+
+    Chunks hold only ids whose cached result (verify_cache.py) is unknown
+    or older than its status's TTL; ttl_hours overrides status_ttl_hours().
+    Results are saved after every chunk, and VERIFY_CHECKPOINT_FILE records
+    the ids submitted so far, so a run that is stopped or crashes loses at
+    most the chunk in flight and the next run skips those ids (unless
+    resume is False, as with --recheck). mode is
+    "api" or "dom" (see VERIFY_MODE); record saves every Backstage JSON
+    response to RESPONSES_DIR.
+    """
+    store = get_store()
+    pending = store.load_pending()
     if not pending:
         log("No pending creators to verify")
         return
-    # Snapshot to ensure we never delete pending entries automatically
-    pending_snapshot = list(pending)
 
-    # Limit to 30 creators max
-    to_verify = pending[:MAX_VERIFY_COUNT]
-    remaining = pending[MAX_VERIFY_COUNT:]
+    resumed = load_checkpoint() if resume else set()
+    cache = VerifyCache(store.load_verified(), ttl_hours)
+    stale = {i.lower() for i in cache.stale([c["id"] for c in pending])} - resumed
+    to_verify = []
+    for c in pending:
+        if c["id"].lower() in stale:
+            stale.discard(c["id"].lower())
+            to_verify.append(c)
+    if len(to_verify) < len(pending):
+        fresh = ", ".join(f"{status} {n}" for status, n in sorted(cache.counts().items()))
+        log(f"Skipping {len(pending) - len(to_verify)} creators with a fresh result ({fresh or 'none'}), "
+            f"already done or listed twice")
+    if not to_verify:
+        log("Nothing to verify")
+        return
 
-    ids = [c["id"] for c in to_verify]
-    # Create lookup for nicknames
-    nickname_map = {c["id"]: c.get("nickname", "") for c in to_verify}
-    log(f"Verifying {len(ids)} creators (max {MAX_VERIFY_COUNT})")
-    if remaining:
-        log(f"  ({len(remaining)} more will be verified next time)")
+    chunks = [to_verify[i:i + MAX_VERIFY_COUNT] for i in range(0, len(to_verify), MAX_VERIFY_COUNT)]
+    log(f"Verifying {len(to_verify)} creators in {len(chunks)} chunks of up to {MAX_VERIFY_COUNT}")
+    checkpoint = {
+        "started_at": int(time.time() * 1000),
+        "total": len(to_verify),
+        "chunks": len(chunks),
+        "chunks_done": 0,
+        "done": sorted(resumed),
+        "available": 0,
+        "unavailable": 0,
+        "finished": False,
+    }
+    save_checkpoint(checkpoint)
 
     async with async_playwright() as p:
-        log("Launching browser...")
+        log("Opening browser...")
 
         launch_args = {
             "user_data_dir": os.path.abspath(USER_DATA_DIR),
@@ -117,173 +245,73 @@ async def verify_all():
             launch_args["channel"] = "chrome"
             log("Using Playwright Chrome channel")
 
-        context = await p.chromium.launch_persistent_context(**launch_args)
-        page = context.pages[0] if context.pages else await context.new_page()
-
-        results = {"available": [], "unavailable": []}
+        page, close_page = await open_page(p, BACKSTAGE_URL, launch_args, log)
+        timer = StepTimer()
+        capture = ResponseCapture(page, RESPONSES_DIR if record else None) if mode == "api" or record else None
+        use_api = mode == "api"
 
         try:
-            # Navigate to backstage
-            log(f"Navigating to {BACKSTAGE_URL}...")
-            await page.goto(BACKSTAGE_URL, timeout=30000, wait_until="domcontentloaded")
-            await asyncio.sleep(3)
-
-            # Check login
-            if "login" in page.url.lower():
-                log("Not logged in. Please log in to Backstage in the opened browser...")
-                login_wait_start = time.time()
-                while "login" in page.url.lower():
-                    if time.time() - login_wait_start > 300:
-                        log("Login timeout after 5 minutes")
-                        return
-                    await asyncio.sleep(2)
-                log("Login detected. Continuing...")
-
-            # Click Add Host button
-            log("Clicking Add Host button...")
-            add_btn = 'button[data-e2e-tag="host_manageRelationship_addHostBtn"]'
-
-            try:
-                await page.wait_for_selector(add_btn, timeout=300000)
-                await page.click(add_btn)
-            except:
-                log("ERROR: Add Host button not found")
-                await page.screenshot(path="debug_batch_error.png")
-                return
-
-            await asyncio.sleep(2)
-
-            # Enter all IDs
-            log(f"Entering {len(ids)} IDs...")
-            textarea = 'textarea[data-testid="inviteHostTextArea"]'
-
-            try:
-                await page.wait_for_selector(textarea, timeout=5000)
-                ids_text = "\n".join(ids)
-                await page.fill(textarea, ids_text)
-            except:
-                log("ERROR: Textarea not found")
-                return
-
-            await asyncio.sleep(1)
-
-            # Click Next
-            log("Clicking Next...")
-            for selector in ["button:has-text('다음')", "button:has-text('Next')", ".semi-modal-content button.semi-button-primary"]:
-                try:
-                    if await page.query_selector(selector):
-                        await page.click(selector)
-                        break
-                except:
-                    continue
-
-            await asyncio.sleep(4)
-
-            # Parse results
-            log("Parsing results...")
-            await page.screenshot(path="debug_batch_results.png")
-
-            try:
-                await page.wait_for_selector(".semi-table-tbody", timeout=10000)
-            except:
-                log("ERROR: Results table not found")
-                return
-
-            rows = await page.query_selector_all('.semi-table-tbody tr[role="row"]')
-            log(f"Found {len(rows)} rows")
-
-            for row in rows:
-                try:
-                    text = await row.inner_text()
-
-                    # Find matching ID
-                    matched_id = None
-                    for uid in ids:
-                        if uid.lower() in text.lower():
-                            matched_id = uid
-                            break
-
-                    if not matched_id:
-                        continue
-
-                    # Determine status
-                    now = int(time.time() * 1000)
-
-                    nickname = nickname_map.get(matched_id, "")
-
-                    if "사용 가능" in text or "Available" in text:
-                        log(f"  OK {matched_id}: Available")
-                        results["available"].append({
-                            "id": matched_id,
-                            "nickname": nickname,
-                            "reason": "사용 가능",
-                            "verified_at": now
-                        })
-                    elif "부적격" in text or "Ineligible" in text:
-                        log(f"  NO {matched_id}: Ineligible")
-                        results["unavailable"].append({
-                            "id": matched_id,
-                            "nickname": nickname,
-                            "reason": "부적격",
-                            "verified_at": now
-                        })
-                    elif "바인딩" in text or "Bound" in text or "에이전시" in text:
-                        log(f"  NO {matched_id}: Already bound")
-                        results["unavailable"].append({
-                            "id": matched_id,
-                            "nickname": nickname,
-                            "reason": "이미 소속됨",
-                            "verified_at": now
-                        })
-                    elif "자격 없음" in text:
-                        log(f"  NO {matched_id}: Not qualified")
-                        results["unavailable"].append({
-                            "id": matched_id,
-                            "nickname": nickname,
-                            "reason": "자격 없음",
-                            "verified_at": now
-                        })
-                    else:
-                        log(f"  ?? {matched_id}: Unknown status")
-                        results["unavailable"].append({
-                            "id": matched_id,
-                            "nickname": nickname,
-                            "reason": "알 수 없음",
-                            "verified_at": now
-                        })
-
-                except Exception as e:
-                    log(f"  Error parsing row: {e}")
-
-            # Save results
-            verified = load_verified()
-            verified["available"].extend(results["available"])
-            verified["unavailable"].extend(results["unavailable"])
-            save_verified(verified)
-
+            for number, chunk in enumerate(chunks, 1):
+                log(f"Chunk {number}/{len(chunks)}")
+                # A fresh load closes the previous chunk's dialog
+                if not await open_backstage(page, timer, reload=number > 1):
+                    return
+
+                ids = [c["id"] for c in chunk]
+                nickname_map = {c["id"]: c.get("nickname", "") for c in chunk}
+                results = await verify_chunk(page, ids, nickname_map, timer, capture if use_api else None)
+                if results is None:
+                    left = sum(len(c) for c in chunks[number - 1:])
+                    log(f"Stopping; {left} creators left for the next run")
+                    return
+
+                if use_api and number == 1 and not capture.statuses(ids):
+                    # The hints don't match this Backstage build; don't wait on every chunk
+                    log("No eligibility response recognised; reading the table for the rest of the run")
+                    use_api = False
+
+                # Save results
+                store.add_verified(results)
+                checkpoint["chunks_done"] += 1
+                checkpoint["done"].extend(ids)
+                checkpoint["available"] += len(results["available"])
+                checkpoint["unavailable"] += len(results["unavailable"])
+                save_checkpoint(checkpoint)
+                log(f"Chunk {number} done. Available: {len(results['available'])}, Unavailable: {len(results['unavailable'])}")
+
+            checkpoint["finished"] = True
+            save_checkpoint(checkpoint)
             # Keep pending list intact (do not remove verified)
-            log(f"\nDone! Available: {len(results['available'])}, Unavailable: {len(results['unavailable'])}")
-            log(f"Pending kept: {len(pending_snapshot)}")
+            log(f"\nDone! Available: {checkpoint['available']}, Unavailable: {checkpoint['unavailable']}")
+            log(f"Pending kept: {len(pending)}")
 
         except Exception as e:
             log(f"ERROR: {e}")
             await page.screenshot(path="debug_batch_exception.png")
 
         finally:
-            # Merge snapshot with any new pending entries added during verification
-            try:
-                current_pending = load_pending()
-                merged = {c.get("id"): c for c in current_pending if c.get("id")}
-                for c in pending_snapshot:
-                    cid = c.get("id")
-                    if cid and cid not in merged:
-                        merged[cid] = c
-                save_pending(list(merged.values()))
-            except Exception as e:
-                log(f"ERROR: Failed to restore pending list: {e}")
-            await asyncio.sleep(2)
-            await context.close()
+            # Pending entries are never rewritten here; store writes are locked
+            # and atomic, so nothing added meanwhile needs restoring
+            log(f"Step timings:\n{timer.report()}")
+            if capture:
+                capture.close()
+                if capture.recorded:
+                    log(f"Recorded {capture.recorded} responses in {RESPONSES_DIR}/")
+            await close_page()
 
 
 if __name__ == "__main__":
-    asyncio.run(verify_all())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ttl", action="append", default=[], metavar="STATUS=HOURS",
+                        help="Keep STATUS results this long (e.g. bound=720); repeatable")
+    parser.add_argument("--recheck", action="store_true", help="Ignore cached results and verify everyone")
+    parser.add_argument("--mode", choices=("api", "dom"), default=VERIFY_MODE,
+                        help="api: eligibility JSON with table fallback; dom: result table only")
+    parser.add_argument("--record", action="store_true",
+                        help=f"Save Backstage JSON responses to {RESPONSES_DIR}/ as fixtures (any mode)")
+    args = parser.parse_args()
+    try:
+        ttl = parse_ttl(args.ttl, status_ttl_hours()) if not args.recheck else {}
+    except ValueError as e:
+        parser.error(str(e))
+    asyncio.run(verify_all(ttl, args.mode, args.record, resume=not args.recheck))
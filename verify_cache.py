@@ -0,0 +1,117 @@
+"""
+Backstage verification results as a cache keyed by handle.
+
+The verified collection (one latest record per id, see
+JsonStore.add_verified) already holds every handle's last status, reason
+and verified_at. VerifyCache reads it once and says which handles still
+have a fresh answer, so verify_batch.py and validate_single.py only spend
+Backstage's 30-ids-per-dialog capacity on handles that are unknown or
+whose result has expired:
+
+    cache = VerifyCache(store.load_verified())
+    to_check = cache.stale(ids)
+    cached = cache.get("some_handle")   # fresh record or None
+
+How long a result stays fresh depends on its status (status_ttl_hours()):
+an agency binding rarely changes, while an available host can be signed
+by another agency any day.
+"""
+import os
+import sys
+import time
+
+from backstage_flow import STATUSES
+
+# status -> hours a result stays fresh (0 re-checks on every run).
+# Override with VERIFY_TTL_HOURS="available=12,bound=1440"
+DEFAULT_TTL_HOURS = {
+    "available": 24,
+    "ineligible": 7 * 24,
+    "not_qualified": 7 * 24,
+    "bound": 30 * 24,
+    "unknown": 0,
+}
+
+_REASON_STATUS = {reason: status for status, (reason, _) in STATUSES.items()}
+
+
+def record_status(record, list_name=None):
+    """Status key of a verified record; older records only have a reason."""
+    if record.get("status") in STATUSES:
+        return record["status"]
+    if list_name == "available":
+        return "available"
+    return _REASON_STATUS.get(record.get("reason", ""), "unknown")
+
+
+def parse_ttl(items, base=DEFAULT_TTL_HOURS):
+    """["bound=720", "available=12"] -> base with those hours (ValueError on bad input)."""
+    ttl = dict(base)
+    for item in items:
+        status, _, hours = item.strip().partition("=")
+        if status not in DEFAULT_TTL_HOURS or not hours:
+            raise ValueError(f"Expected STATUS=HOURS with STATUS one of {', '.join(DEFAULT_TTL_HOURS)}: {item}")
+        ttl[status] = float(hours)
+    return ttl
+
+
+def status_ttl_hours():
+    """DEFAULT_TTL_HOURS with the VERIFY_TTL_HOURS overrides.
+
+    Read when needed rather than at import, so a malformed value only costs
+    a warning (on stderr) instead of breaking every script importing this.
+    """
+    raw = os.environ.get("VERIFY_TTL_HOURS", "")
+    try:
+        return parse_ttl(i for i in raw.split(",") if i.strip())
+    except ValueError as e:
+        print(f"Ignoring VERIFY_TTL_HOURS={raw!r}: {e}", file=sys.stderr)
+        return dict(DEFAULT_TTL_HOURS)
+
+
+class VerifyCache:
+    """Latest verification per handle (case-insensitive) with per-status expiry."""
+
+    def __init__(self, verified, ttl_hours=None, now=None):
+        self.ttl_hours = status_ttl_hours() if ttl_hours is None else ttl_hours
+        self.now = int((time.time() if now is None else now) * 1000)
+        self.records = {}
+        for list_name in ("available", "unavailable"):
+            raw = verified.get(list_name, []) or verified.get(list_name + "_creators", [])
+            for c in raw:
+                if not c.get("id"):
+                    continue
+                key = c["id"].lower()
+                # Files written before add_verified replaced old results can repeat an id
+                if key in self.records and self.records[key].get("verified_at", 0) > c.get("verified_at", 0):
+                    continue
+                self.records[key] = dict(c, status=record_status(c, list_name))
+
+    def expires_at(self, record):
+        return record.get("verified_at", 0) + int(self.ttl_hours.get(record["status"], 0) * 3600 * 1000)
+
+    def get(self, handle):
+        """The handle's record if it is still fresh, else None."""
+        record = self.records.get(handle.lower())
+        if record and self.expires_at(record) > self.now:
+            return record
+        return None
+
+    def stale(self, handles):
+        """Handles without a fresh result, in order and without duplicates."""
+        seen = set()
+        result = []
+        for handle in handles:
+            key = handle.lower()
+            if key not in seen and self.get(handle) is None:
+                result.append(handle)
+            seen.add(key)
+        return result
+
+    def counts(self):
+        """{status: fresh records}, for logging."""
+        counts = {}
+        for record in self.records.values():
+            if self.expires_at(record) > self.now:
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
@@ -3,12 +3,16 @@ import json
 import os
 import sys
 import time
-from datetime import datetime
 
 from playwright.async_api import async_playwright
 
+from backstage_flow import (
+    StepTimer, extract_rows, match_rows, open_invite_dialog, submit_ids, wait_for_backstage, wait_for_rows,
+)
+from browser_service import open_page
+from storage import get_store
+
 USER_DATA_DIR = "./tiktok_user_data"
-VERIFICATION_FILE = "verified_creators.json"
 STREAMERS_FILE = "streamers_data.json"
 ACTIVE_STREAMERS_FILE = "active_streamers.txt"
 BACKSTAGE_URL = "https://live-backstage.tiktok.com/portal/anchor/relation"
@@ -80,74 +84,37 @@ async def verify_creators_on_backstage(headless=False):
         if os.path.exists(chrome_path):
              launch_args["executable_path"] = chrome_path
 
-        context = await p.chromium.launch_persistent_context(**launch_args)
-        page = context.pages[0] if context.pages else await context.new_page()
+        page, close_page = await open_page(p, BACKSTAGE_URL, launch_args)
+        timer = StepTimer()
 
         try:
-            # 1. Go to URL
-            print(f"\n🌐 Navigating to Backstage...")
-            await page.goto(BACKSTAGE_URL, timeout=60000, wait_until="domcontentloaded")
-            await asyncio.sleep(5) # Wait for initial load
+            # 1. Go to URL (a warm page is already there)
+            if not page.url.startswith(BACKSTAGE_URL):
+                print(f"\n🌐 Navigating to Backstage...")
+                await page.goto(BACKSTAGE_URL, timeout=60000, wait_until="domcontentloaded")
+            await wait_for_backstage(page, timer, timeout=60000)
 
             # 2. Click "Add Host" / "Invite Creator" button
             print("👆 Clicking 'Add Host' button...")
-            add_btn_selector = 'button[data-e2e-tag="host_manageRelationship_addHostBtn"]'
-            
-            # Wait separately for button
             try:
-                await page.wait_for_selector(add_btn_selector, timeout=10000)
-                await page.click(add_btn_selector)
+                await open_invite_dialog(page, timer)
             except Exception:
-                print(f"⚠️ Could not find 'Add Host' button ({add_btn_selector}).")
-                # Fallback: Try finding by text if selector fails?
-                # But selector is very specific, so likely correct.
+                print("⚠️ Could not open the 'Add Host' dialog.")
                 # Just dumping a screenshot for debug if this part fails
                 await page.screenshot(path="debug_no_button.png")
                 raise
 
-            await asyncio.sleep(2) # Wait for modal
-
-            # 3. Paste IDs into Textarea
+            # 3. Paste IDs into Textarea (one ID per line) and click Next
             print("📝 Pasting creator IDs...")
-            textarea_selector = 'textarea[data-testid="inviteHostTextArea"]'
-            await page.wait_for_selector(textarea_selector, timeout=10000)
-            
-            # Use chunks if too many, but textarea should handle it.
-            # Format: one ID per line
-            ids_text = "\n".join(creator_ids)
-            await page.fill(textarea_selector, ids_text)
-            
-            await asyncio.sleep(1)
-
-            # 4. Click Next
-            print("➡️ Clicking Next...")
-            # User provided: <span class="semi-button-content" x-semi-prop="children">다음</span>
-            # We look for a button containing "다음" or "Next"
-            # Attempt to find button with text "다음"
-            next_btn_selector = "button:has-text('다음')"
-            
-            # Check if korean button exists
-            if await page.query_selector(next_btn_selector):
-                await page.click(next_btn_selector)
-            elif await page.query_selector("button:has-text('Next')"):
-                await page.click("button:has-text('Next')")
-            else:
-                # Try explicit class selector or look for primary button in modal footer
-                # Sometimes the class structure is complex. 
-                # Let's try to click the button that matches the structure provided by user if specific text fails.
-                # User provided: class="semi-button semi-button-primary ..."
-                # We can try clicking the LAST primary button in the dialog.
-                print("⚠️ Specific text button not found, trying generic primary button...")
-                await page.click('.semi-modal-content button.semi-button-primary')
+            await submit_ids(page, creator_ids, timer)
 
             print("⏳ Waiting for validation results...")
-            await asyncio.sleep(5) 
-            
+            try:
+                await wait_for_rows(page, creator_ids, timer)
+            except Exception:
+                print("⚠️ Table not complete, might be empty results.")
+
             # 5. Extract Results
-            # Extract text and split by lines to check context
-            body_text = await page.inner_text("body")
-            lines = body_text.splitlines()
-            
             # Keywords that imply the user is valid and can be invited
             # Based on previous logic and common UI patterns
             VALID_KEYWORDS = ["초대", "Invite", "Add", "사용 가능", "보내기"]
@@ -156,56 +123,33 @@ async def verify_creators_on_backstage(headless=False):
             
             print("🔍 Analyzing constraints from table...")
             
-            # Wait for the table to appear (based on user's HTML snippet class)
-            try:
-                await page.wait_for_selector(".semi-table-tbody", timeout=10000)
-            except:
-                print("⚠️ Table not found, might be empty results.")
-            
             available = []
             
             # Select all rows in the results table
-            rows = await page.query_selector_all('.semi-table-tbody tr[role="row"]')
+            # All rows' cells in one round trip; ids matched by exact handle
+            rows = await extract_rows(page)
             print(f"   found {len(rows)} rows in result table.")
+            matched = match_rows(rows, creator_ids)
+            matched_rows = {id(row) for row in matched.values()}
+
+            for matched_id, row in matched.items():
+                # Column 2: Status (User explicitly pointed out: <div ...>사용 가능</div>)
+                status_text = row["cells"][1] if len(row["cells"]) > 1 else ""
+                if "사용 가능" in status_text:
+                    print(f"   ✓ {matched_id}: Available (Status: {status_text.strip()})")
+                    available.append({
+                        "id": matched_id,
+                        "status": "available",
+                        "reason": "사용 가능",
+                        "verified_at": int(time.time() * 1000)
+                    })
 
             for row in rows:
-                try:
-                    # Column 2: Status (User explicitly pointed out: <div ...>사용 가능</div>)
-                    status_cell = await row.query_selector('td[aria-colindex="2"]')
-                    status_text = await status_cell.inner_text() if status_cell else ""
-                    
-                    if "사용 가능" in status_text:
-                        # Column 1: User Info -> Extract ID
-                        user_cell = await row.query_selector('td[aria-colindex="1"]')
-                        user_text = await user_cell.inner_text() if user_cell else ""
-                        
-                        # Find which of our requested IDs matches this row
-                        matched_id = None
-                        for uid in creator_ids:
-                            # user_text likely "7draw23dream\n드드" or similar
-                            # Check if uid is in the text (case-insensitive just in case)
-                            if uid.lower() in user_text.lower():
-                                matched_id = uid
-                                break
-                        
-                        if matched_id:
-                            print(f"   ✓ {matched_id}: Available (Status: {status_text.strip()})")
-                            available.append({
-                                "id": matched_id,
-                                "status": "available",
-                                "verified_at": datetime.now().isoformat()
-                            })
-                        else:
-                            # Sometimes the ID in the table might be slightly different or we missed it
-                            # Log the raw text for debugging
-                            cleaned_text = user_text.replace('\n', ' ').strip()
-                            print(f"   ❓ Found 'Available' row but couldn't exact-match ID from text: '{cleaned_text}'")
-                            # If we can't match exactly, we might want to try to extract the ID directly if possible
-                            # But for now, safest is to match against our input list.
-                            
-                except Exception as e:
-                    print(f"   ⚠️ Error parsing a row: {e}")
-                    continue
+                status_text = row["cells"][1] if len(row["cells"]) > 1 else ""
+                if "사용 가능" in status_text and id(row) not in matched_rows:
+                    # Log the raw user cell for debugging
+                    cleaned_text = (row["cells"][0] if row["cells"] else row["text"]).replace('\n', ' ').strip()
+                    print(f"   ❓ Found 'Available' row but couldn't exact-match ID from text: '{cleaned_text}'")
 
             # Check for empty results
             if not available and not rows:
@@ -213,19 +157,11 @@ async def verify_creators_on_backstage(headless=False):
             elif not available:
                  print("   ❌ Rows found, but none were 'Available'.")
 
-            # Save results
-            verification_data = {
-                "verified_at": datetime.now().isoformat(),
-                "total_checked": len(creator_ids),
-                "available_count": len(available),
-                "available_creators": available,
-            }
-
-            with open(VERIFICATION_FILE, "w", encoding="utf-8") as f:
-                json.dump(verification_data, f, ensure_ascii=False, indent=2)
+            # Save results through the shared store (locked, one record per id)
+            get_store().add_verified({"available": available})
 
-            print(f"\n✅ Verification Success! Found {len(available)} potential matches.")
-            print(f"💾 Saved to {VERIFICATION_FILE}")
+            print(f"\n✅ Verification Success! Found {len(available)} of {len(creator_ids)} available.")
+            print(f"💾 Saved {len(available)} results to verified creators")
 
         except Exception as e:
             print(f"❌ Error during verification: {e}")
@@ -234,8 +170,8 @@ async def verify_creators_on_backstage(headless=False):
             await page.screenshot(path="backstage_error.png")
         
         finally:
-             await asyncio.sleep(2)
-             await context.close()
+             print(f"⏱️ Step timings:\n{timer.report()}")
+             await close_page()
 
 if __name__ == "__main__":
     headless = "--headless" in sys.argv